@@ -4,15 +4,24 @@ Provides REST endpoints for making predictions using trained RandomForest models
 Run: python predictions_api.py
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from predictor import GlucosePredictor
+from predictor import GlucosePredictor, FEATURE_KEYS
+from coalescer import PredictionCoalescer
+from columnar_format import (
+    ARROW_CONTENT_TYPE, COLUMNAR_CONTENT_TYPE, arrow_available,
+    decode_arrow, decode_columns, encode_arrow, encode_columns
+)
+from instrumentation import RequestInstrumentation
+import numpy as np
+import csv
+import json
 import os
 import logging
 from datetime import datetime
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging (DEBUG adds full request and response dumps)
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
@@ -24,17 +33,94 @@ CORS(app,
      allow_headers=["Content-Type", "Authorization"],
      supports_credentials=True)
 
+# Request counters and per-stage latency histograms at /metrics; one JSON log
+# line per sampled, failed (5xx) or slow request
+instrumentation = RequestInstrumentation(
+    app,
+    'diasense_predictions',
+    logger,
+    sample_rate=float(os.environ.get('LOG_SAMPLE_RATE', 0.01)),
+    slow_request_s=float(os.environ.get('LOG_SLOW_REQUEST_MS', 250)) / 1000
+)
+
 # Global predictor instance
 predictor = None
 
+# Optional micro-batching layer in front of the predictor for single predictions
+coalescer = None
+
+# Bounded request pool, set when served through asgi.py
+worker_pool = None
+
+instrumentation.metrics.gauge('model_loaded', 'Whether the prediction models are loaded',
+                              lambda: int(bool(predictor and predictor.is_loaded)))
+instrumentation.metrics.gauge('worker_pool_in_flight', 'Requests running or queued on the ASGI worker pool',
+                              lambda: worker_pool.stats()['in_flight'] if worker_pool else None)
+
+# Accepted input ranges (very relaxed for real-world device data and calibration issues)
+# (field, label, low, high, range text)
+INPUT_RANGES = [
+    ('heart_rate', 'Heart rate', 20, 200, '20-200 BPM'),
+    ('spo2', 'SpO2', 0, 100, '0-100%'),
+    ('gsr', 'GSR', 0, 100, '0-100 V'),
+]
+
+# Risk bands by predicted glucose (mg/dL), checked in order: (upper bound, level, recommendation)
+RISK_BANDS = [
+    (70, 'low', "⚠️ Low glucose detected. Consider consuming a quick-acting carbohydrate."),
+    (110, 'normal', "✅ Glucose level is normal. Continue current routine."),
+    (140, 'elevated', "⚡ Glucose is slightly elevated. Consider light activity or wait before next meal."),
+    (250, 'high', "🔴 High glucose detected. Consult your healthcare provider if persistent."),
+]
+CRITICAL_RISK = ('critical', "🚨 CRITICAL: Seek immediate medical attention!")
+RISK_LEVELS = [band[1] for band in RISK_BANDS] + [CRITICAL_RISK[0]]
+
+# Per-row error codes in binary batch responses (list index = code)
+COLUMNAR_ERROR_CODES = ['ok', 'invalid_value'] + [f'{field}_out_of_range' for field, *_ in INPUT_RANGES]
+
+# Columns of a binary (columnar format) batch response, all float32. Status and
+# risk level are indices into the X-Status-Classes / X-Risk-Levels headers (-1 on error)
+COLUMNAR_RESPONSE_COLUMNS = ['glucose_prediction', 'status_confidence', 'diabetes_status', 'risk_level', 'error_code']
+
+# Rows evaluated per forest pass on the streaming endpoint
+STREAM_CHUNK_SIZE = int(os.environ.get('PREDICTION_STREAM_CHUNK_SIZE', 1024))
+
+# Streaming body formats by Content-Type
+STREAM_FORMATS = {
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'text/csv': 'csv',
+}
+
+# CSV header names from glucose_dataset.csv mapped to API field names
+CSV_COLUMN_ALIASES = {'heartrate': 'heart_rate'}
+
 def init_app():
     """Initialize the application with predictor"""
-    global predictor
+    global predictor, coalescer
     
     logger.info("🤖 Initializing Glucose Predictor...")
     try:
         model_path = os.path.join(os.path.dirname(__file__), "rf_glucose_model.pkl")
-        predictor = GlucosePredictor(model_path)
+        # Compiled forests for small requests, sklearn's Cython loop for large batches
+        backend = os.environ.get('PREDICTION_BACKEND', 'auto')
+        predictor = GlucosePredictor(
+            model_path,
+            backend=backend,
+            cache_size=int(os.environ.get('PREDICTION_CACHE_SIZE', 4096)),
+            cache_ttl=float(os.environ.get('PREDICTION_CACHE_TTL_S', 300)),
+            cache_gsr_resolution=float(os.environ.get('PREDICTION_CACHE_GSR_RESOLUTION', 0)),
+            # 'grid' answers from the precomputed lookup grid (approximate, O(1))
+            mode=os.environ.get('PREDICTION_MODE', 'exact'),
+            grid_interpolation=os.environ.get('PREDICTION_GRID_INTERPOLATION', 'nearest')
+        )
+        
+        # Coalesce concurrent single predictions when a window is configured
+        window_ms = float(os.environ.get('PREDICTION_COALESCE_WINDOW_MS', 0))
+        if predictor.is_loaded and window_ms > 0:
+            max_batch = int(os.environ.get('PREDICTION_COALESCE_MAX_BATCH', 64))
+            coalescer = PredictionCoalescer(predictor, window_ms=window_ms, max_batch_size=max_batch)
+            logger.info(f"⏱️  Coalescing single predictions ({window_ms} ms / {max_batch} rows)")
         
         if predictor.is_loaded:
             logger.info("✅ Glucose Predictor initialized successfully!")
@@ -43,6 +129,267 @@ def init_app():
     except Exception as e:
         logger.error(f"❌ Error initializing predictor: {str(e)}")
 
+def assess_risk(glucose):
+    """Return (risk_level, recommendation) for a single glucose value"""
+    if glucose < RISK_BANDS[0][0]:
+        return RISK_BANDS[0][1:]
+    for upper, risk_level, recommendation in RISK_BANDS[1:]:
+        if glucose <= upper:
+            return risk_level, recommendation
+    return CRITICAL_RISK
+
+def _risk_conditions(glucose):
+    conditions = [glucose < RISK_BANDS[0][0]]
+    conditions += [glucose <= upper for upper, _, _ in RISK_BANDS[1:]]
+    return conditions
+
+def assess_risk_batch(glucose):
+    """Vectorized assess_risk over an array of glucose values"""
+    conditions = _risk_conditions(glucose)
+    risk_levels = np.select(conditions, [band[1] for band in RISK_BANDS], CRITICAL_RISK[0])
+    recommendations = np.select(conditions, [band[2] for band in RISK_BANDS], CRITICAL_RISK[1])
+    return risk_levels, recommendations
+
+def risk_level_index(glucose):
+    """Vectorized index into RISK_LEVELS for an array of glucose values"""
+    return np.select(_risk_conditions(glucose), np.arange(len(RISK_BANDS)), len(RISK_BANDS))
+
+def parse_sample_columns(samples):
+    """
+    Parse a list of sample dicts into an (N, 3) float matrix in one pass
+    
+    Returns:
+        Tuple of (features, errors) where errors maps row index to an error
+        message. Rows with errors are NaN in features.
+    """
+    try:
+        features = np.array(
+            [[sample[key] for key in FEATURE_KEYS] for sample in samples],
+            dtype=np.float64
+        )
+        if features.shape != (len(samples), len(FEATURE_KEYS)):
+            raise ValueError('ragged samples')
+        return features, {}
+    except (KeyError, TypeError, ValueError):
+        pass
+    
+    # Slow path: at least one malformed row, so parse row by row to pin it down
+    features = np.full((len(samples), len(FEATURE_KEYS)), np.nan)
+    errors = {}
+    for i, sample in enumerate(samples):
+        try:
+            features[i] = [float(sample[key]) for key in FEATURE_KEYS]
+        except KeyError as e:
+            errors[i] = f'Missing required field: {e.args[0]}'
+        except (ValueError, TypeError):
+            errors[i] = 'Invalid input values. Expected numbers.'
+    return features, errors
+
+def validate_sample_columns(features, errors):
+    """
+    Apply the INPUT_RANGES checks to a feature matrix as vectorized masks
+    
+    Returns:
+        Boolean mask of valid rows. Out-of-range rows are added to errors.
+    """
+    valid = np.ones(len(features), dtype=bool)
+    for column, (field, label, low, high, range_text) in enumerate(INPUT_RANGES):
+        values = features[:, column]
+        in_range = (values >= low) & (values <= high)
+        for i in np.flatnonzero(valid & ~in_range).tolist():
+            errors.setdefault(i, f'{label} {values[i]} out of range ({range_text})')
+        valid &= in_range
+    # NaN rows fail every range check; make sure parse errors win
+    for i in errors:
+        valid[i] = False
+    return valid
+
+def predict_sample_columns(features, valid):
+    """
+    Run the forests once over the valid rows of a feature matrix
+    
+    Returns:
+        List of per-row result dicts (None for invalid rows)
+    """
+    results = [None] * len(features)
+    rows = np.flatnonzero(valid)
+    if len(rows) == 0:
+        return results
+    
+    valid_features = features[rows]
+    glucose, status, confidence = predictor.predict_arrays(valid_features)
+    glucose = [round(value, 2) for value in glucose.tolist()]
+    confidence = [round(value, 4) for value in confidence.tolist()]
+    risk_levels, recommendations = assess_risk_batch(np.array(glucose))
+    
+    for i, inputs, g, s, c, risk_level, recommendation in zip(
+            rows.tolist(), valid_features.tolist(), glucose, status.tolist(),
+            confidence, risk_levels.tolist(), recommendations.tolist()):
+        results[i] = {
+            'glucose_prediction': g,
+            'glucose_unit': 'mg/dL',
+            'diabetes_status': str(s),
+            'status_confidence': c,
+            'risk_level': risk_level,
+            'recommendation': recommendation,
+            'input': {
+                'heart_rate': inputs[0],
+                'spo2': inputs[1],
+                'gsr': inputs[2]
+            }
+        }
+    return results
+
+def predict_samples(samples):
+    """
+    Run the columnar pipeline (parse -> range masks -> one forest pass) over sample dicts
+    
+    Returns:
+        Tuple of (per-sample results in input order, number of successful predictions)
+    """
+    with instrumentation.stage('parse'):
+        features, errors = parse_sample_columns(samples)
+    with instrumentation.stage('validation'):
+        valid = validate_sample_columns(features, errors)
+    with instrumentation.stage('inference'):
+        predictions = predict_sample_columns(features, valid)
+    for i, message in errors.items():
+        predictions[i] = {
+            'error': message,
+            'input': samples[i]
+        }
+    return predictions, int(valid.sum())
+
+def sample_error_codes(features):
+    """Vectorized per-row COLUMNAR_ERROR_CODES for a feature matrix (0 = valid)"""
+    codes = np.where(np.isfinite(features).all(axis=1), 0, 1).astype(np.int8)
+    for column, (field, label, low, high, range_text) in enumerate(INPUT_RANGES):
+        values = features[:, column]
+        out_of_range = (codes == 0) & ~((values >= low) & (values <= high))
+        codes[out_of_range] = column + 2
+    return codes
+
+def predict_columns(features):
+    """
+    Columnar prediction without per-row Python objects (binary formats)
+    
+    Returns:
+        Dict of arrays keyed like COLUMNAR_RESPONSE_COLUMNS. Invalid rows have
+        NaN glucose/confidence and -1 status/risk indices.
+    """
+    with instrumentation.stage('validation'):
+        codes = sample_error_codes(features)
+    valid = codes == 0
+    n = len(features)
+    glucose = np.full(n, np.nan)
+    confidence = np.full(n, np.nan)
+    status_index = np.full(n, -1, dtype=np.int16)
+    risk_index = np.full(n, -1, dtype=np.int16)
+    
+    if valid.any():
+        with instrumentation.stage('inference'):
+            valid_glucose, probabilities, _ = predictor.predict_outputs(features[valid])
+        best = np.argmax(probabilities, axis=1)
+        glucose[valid] = valid_glucose
+        confidence[valid] = probabilities[np.arange(len(best)), best]
+        status_index[valid] = best
+        risk_index[valid] = risk_level_index(np.round(valid_glucose, 2))
+    
+    return {
+        'glucose_prediction': glucose,
+        'status_confidence': confidence,
+        'diabetes_status': status_index,
+        'risk_level': risk_index,
+        'error_code': codes
+    }
+
+def columnar_batch_predict(mimetype):
+    """Batch prediction for binary columnar or Arrow IPC request bodies"""
+    try:
+        with instrumentation.stage('parse'):
+            body = request.get_data(cache=False)
+            if mimetype == ARROW_CONTENT_TYPE:
+                if not arrow_available():
+                    return jsonify({
+                        'error': 'Arrow IPC requires pyarrow, which is not installed',
+                        'status': 'error'
+                    }), 415
+                columns = decode_arrow(body, FEATURE_KEYS)
+            else:
+                columns = decode_columns(body)
+                if columns.shape[0] != len(FEATURE_KEYS):
+                    raise ValueError(f'Expected {len(FEATURE_KEYS)} columns {list(FEATURE_KEYS)}, got {columns.shape[0]}')
+    except ValueError as e:
+        return jsonify({'error': str(e), 'status': 'error'}), 400
+    
+    if columns.shape[1] == 0:
+        return jsonify({
+            'error': 'No samples provided',
+            'status': 'error'
+        }), 400
+    
+    # (n_columns, n_rows) -> (n_rows, n_features) view, no copy
+    result = predict_columns(columns.T)
+    classes = [str(c) for c in predictor.classes]
+    successful = int((result['error_code'] == 0).sum())
+    logger.debug(f"✅ Columnar batch prediction complete: {successful}/{columns.shape[1]} successful")
+    
+    headers = {
+        'X-Total-Samples': str(columns.shape[1]),
+        'X-Successful': str(successful),
+        'X-Error-Codes': ','.join(COLUMNAR_ERROR_CODES)
+    }
+    if mimetype == ARROW_CONTENT_TYPE:
+        payload = encode_arrow({
+            'glucose_prediction': result['glucose_prediction'],
+            'status_confidence': result['status_confidence'],
+            # Index -1 (error rows) picks the trailing None
+            'diabetes_status': np.array(classes + [None], dtype=object)[result['diabetes_status']],
+            'risk_level': np.array(RISK_LEVELS + [None], dtype=object)[result['risk_level']],
+            'error_code': result['error_code']
+        })
+    else:
+        payload = encode_columns([result[name] for name in COLUMNAR_RESPONSE_COLUMNS])
+        headers.update({
+            'X-Columns': ','.join(COLUMNAR_RESPONSE_COLUMNS),
+            'X-Status-Classes': ','.join(classes),
+            'X-Risk-Levels': ','.join(RISK_LEVELS)
+        })
+    return Response(payload, mimetype=mimetype, headers=headers)
+
+def iter_stream_samples(stream, fmt):
+    """
+    Lazily parse a streamed NDJSON or CSV request body
+    
+    Yields:
+        (sample, error) pairs. sample is a dict for readable rows; for rows that
+        cannot be decoded it is the raw line and error holds the reason.
+    """
+    lines = (raw.decode('utf-8', errors='replace').strip() for raw in stream)
+    lines = (line for line in lines if line)
+    
+    if fmt == 'ndjson':
+        for line in lines:
+            try:
+                sample = json.loads(line)
+            except ValueError:
+                yield line, 'Invalid JSON line'
+                continue
+            yield sample, None
+        return
+    
+    # CSV: first non-empty line is the header; dataset-style names are accepted too
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [CSV_COLUMN_ALIASES.get(name.strip().lower(), name.strip().lower()) for name in header]
+    for row in reader:
+        if len(row) != len(columns):
+            yield ','.join(row), f'Expected {len(columns)} columns, got {len(row)}'
+            continue
+        yield dict(zip(columns, row)), None
+
 # ============================================================================
 # API ENDPOINTS
 # ============================================================================
@@ -83,86 +430,53 @@ def predict_glucose():
                 'status': 'error'
             }), 400
         
-        data = request.json
-        logger.info(f"📨 Prediction request: {data}")
-        
-        # Validate input
-        required_fields = ['heart_rate', 'spo2', 'gsr']
-        if not all(field in data for field in required_fields):
-            logger.warning(f"Missing required fields: {required_fields}")
-            return jsonify({
-                'error': f'Missing required fields: {required_fields}',
-                'status': 'error'
-            }), 400
-        
-        # Extract and convert values
-        try:
-            heart_rate = float(data['heart_rate'])
-            spo2 = float(data['spo2'])
-            gsr = float(data['gsr'])
-        except (ValueError, TypeError) as e:
-            logger.warning(f"Invalid input types: {str(e)}")
-            return jsonify({
-                'error': 'Invalid input values. Expected numbers.',
-                'received': data,
-                'status': 'error'
-            }), 400
-        
-        logger.info(f"📊 Received values - HR: {heart_rate}, SpO2: {spo2}, GSR: {gsr}")
-        
-        # Validate ranges (very relaxed for real-world device data and calibration issues)
-        # Heart rate: 20-200 BPM (allows for extreme cases)
-        if not (20 <= heart_rate <= 200):
-            logger.error(f"HR out of range: {heart_rate}")
-            return jsonify({
-                'error': f'Heart rate {heart_rate} out of range (20-200 BPM)',
-                'received': {'heart_rate': heart_rate},
-                'status': 'error'
-            }), 400
-        
-        # SpO2: 0-100% (very relaxed since device might send uncalibrated values)
-        if not (0 <= spo2 <= 100):
-            logger.error(f"SpO2 out of range: {spo2}")
-            return jsonify({
-                'error': f'SpO2 {spo2} out of range (0-100%)',
-                'received': {'spo2': spo2},
-                'status': 'error'
-            }), 400
-        
-        # GSR: 0-100 V
-        if not (0 <= gsr <= 100):
-            logger.error(f"GSR out of range: {gsr}")
-            return jsonify({
-                'error': f'GSR {gsr} out of range (0-100 V)',
-                'received': {'gsr': gsr},
-                'status': 'error'
-            }), 400
+        with instrumentation.stage('parse'):
+            data = request.json
+            logger.debug("📨 Prediction request: %s", data)
+            
+            # Validate input
+            required_fields = ['heart_rate', 'spo2', 'gsr']
+            if not all(field in data for field in required_fields):
+                logger.debug(f"Missing required fields: {required_fields}")
+                return jsonify({
+                    'error': f'Missing required fields: {required_fields}',
+                    'status': 'error'
+                }), 400
+            
+            # Extract and convert values
+            try:
+                heart_rate = float(data['heart_rate'])
+                spo2 = float(data['spo2'])
+                gsr = float(data['gsr'])
+            except (ValueError, TypeError) as e:
+                logger.debug(f"Invalid input types: {str(e)}")
+                return jsonify({
+                    'error': 'Invalid input values. Expected numbers.',
+                    'received': data,
+                    'status': 'error'
+                }), 400
         
-        logger.info(f"✅ All values passed validation")
+        # Validate ranges
+        with instrumentation.stage('validation'):
+            values = {'heart_rate': heart_rate, 'spo2': spo2, 'gsr': gsr}
+            for field, label, low, high, range_text in INPUT_RANGES:
+                if not (low <= values[field] <= high):
+                    logger.debug(f"{label} out of range: {values[field]}")
+                    return jsonify({
+                        'error': f'{label} {values[field]} out of range ({range_text})',
+                        'received': {field: values[field]},
+                        'status': 'error'
+                    }), 400
         
         # Get prediction
-        logger.info("🤖 Making prediction...")
-        result = predictor.predict_full(heart_rate, spo2, gsr)
+        with instrumentation.stage('inference'):
+            result = (coalescer or predictor).predict_full(heart_rate, spo2, gsr)
         glucose = result['glucose_prediction']
         status = result['diabetes_status']
         confidence = result['status_confidence']
         
         # Determine risk level and recommendation
-        if glucose < 70:
-            risk_level = "low"
-            recommendation = "⚠️ Low glucose detected. Consider consuming a quick-acting carbohydrate."
-        elif 70 <= glucose <= 110:
-            risk_level = "normal"
-            recommendation = "✅ Glucose level is normal. Continue current routine."
-        elif 110 <= glucose <= 140:
-            risk_level = "elevated"
-            recommendation = "⚡ Glucose is slightly elevated. Consider light activity or wait before next meal."
-        elif 140 <= glucose <= 250:
-            risk_level = "high"
-            recommendation = "🔴 High glucose detected. Consult your healthcare provider if persistent."
-        else:
-            risk_level = "critical"
-            recommendation = "🚨 CRITICAL: Seek immediate medical attention!"
+        risk_level, recommendation = assess_risk(glucose)
         
         response = {
             'glucose_prediction': round(glucose, 2),
@@ -180,8 +494,7 @@ def predict_glucose():
             'status': 'success'
         }
         
-        logger.info(f"✅ Prediction successful: {glucose:.2f} mg/dL ({status})")
-        logger.info(f"📤 Response: {response}")
+        logger.debug("📤 Response: %s", response)
         return jsonify(response), 200
     
     except Exception as e:
@@ -204,6 +517,12 @@ def batch_predict():
             {"heart_rate": 105, "spo2": 94, "gsr": 0.75}
         ]
     }
+    
+    Binary alternatives, selected by Content-Type (the response uses the same format):
+    - application/vnd.diasense.columnar: float32 heart_rate/spo2/gsr columns
+      (see columnar_format.py); response columns are COLUMNAR_RESPONSE_COLUMNS
+    - application/vnd.apache.arrow.stream: Arrow IPC with heart_rate/spo2/gsr
+      columns (requires pyarrow)
     """
     try:
         if not predictor or not predictor.is_loaded:
@@ -212,16 +531,20 @@ def batch_predict():
                 'status': 'error'
             }), 503
         
+        if request.mimetype in (COLUMNAR_CONTENT_TYPE, ARROW_CONTENT_TYPE):
+            return columnar_batch_predict(request.mimetype)
+        
         if not request.is_json:
             return jsonify({
                 'error': 'Content-Type must be application/json',
                 'status': 'error'
             }), 400
         
-        data = request.json
+        with instrumentation.stage('parse'):
+            data = request.json
         samples = data.get('samples', [])
         
-        logger.info(f"📨 Batch prediction request: {len(samples)} samples")
+        logger.debug(f"📨 Batch prediction request: {len(samples)} samples")
         
         if not samples:
             return jsonify({
@@ -229,31 +552,25 @@ def batch_predict():
                 'status': 'error'
             }), 400
         
-        predictions = []
-        for i, sample in enumerate(samples):
-            try:
-                result = predictor.predict_full(
-                    float(sample['heart_rate']),
-                    float(sample['spo2']),
-                    float(sample['gsr'])
-                )
-                predictions.append(result)
-            except Exception as e:
-                logger.warning(f"Failed to predict sample {i}: {str(e)}")
-                predictions.append({
-                    'error': str(e),
-                    'input': sample
-                })
+        if not isinstance(samples, list):
+            return jsonify({
+                'error': 'samples must be a list',
+                'status': 'error'
+            }), 400
+        
+        predictions, successful = predict_samples(samples)
+        if successful < len(samples):
+            logger.debug(f"{len(samples) - successful} of {len(samples)} samples failed validation")
         
         response = {
             'predictions': predictions,
             'total_samples': len(samples),
-            'successful': len([p for p in predictions if 'error' not in p]),
+            'successful': successful,
             'timestamp': datetime.now().isoformat(),
             'status': 'success'
         }
         
-        logger.info(f"✅ Batch prediction complete: {response['successful']}/{len(samples)} successful")
+        logger.debug(f"✅ Batch prediction complete: {response['successful']}/{len(samples)} successful")
         return jsonify(response), 200
     
     except Exception as e:
@@ -264,12 +581,102 @@ def batch_predict():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+@app.route('/api/predictions/stream', methods=['POST'])
+def stream_predict():
+    """
+    Stream predictions for a long upload (e.g. a device backfill)
+    
+    Request body (streamed, Content-Type application/x-ndjson or text/csv):
+        {"heart_rate": 75, "spo2": 97, "gsr": 0.5}
+        {"heart_rate": 105, "spo2": 94, "gsr": 0.75}
+    or
+        heart_rate,spo2,gsr
+        75,97,0.5
+    
+    Response (application/x-ndjson), one line per sample in input order,
+    followed by a summary line:
+        {"index": 0, "glucose_prediction": 104.87, ...}
+        {"index": 1, "error": "...", "input": {...}}
+        {"summary": {"total_samples": 2, "successful": 1}, "status": "success", ...}
+    
+    Samples are evaluated in chunks of STREAM_CHUNK_SIZE through the batch
+    pipeline, so memory use does not depend on the size of the upload.
+    """
+    if not predictor or not predictor.is_loaded:
+        return jsonify({
+            'error': 'Prediction model not initialized',
+            'status': 'error'
+        }), 503
+    
+    fmt = STREAM_FORMATS.get(request.mimetype)
+    if fmt is None:
+        return jsonify({
+            'error': f'Content-Type must be one of {sorted(STREAM_FORMATS)}',
+            'status': 'error'
+        }), 415
+    
+    stream = request.stream
+    logger.debug(f"📨 Streaming prediction request ({fmt})")
+    
+    def generate():
+        total = 0
+        successful = 0
+        chunk = []
+        
+        def flush():
+            samples = [sample if error is None else None for sample, error in chunk]
+            predictions, ok = predict_samples(samples)
+            lines = []
+            for offset, ((sample, error), prediction) in enumerate(zip(chunk, predictions)):
+                if error is not None:
+                    prediction = {'error': error, 'input': sample}
+                lines.append(json.dumps({'index': total + offset, **prediction}))
+            return ok, '\n'.join(lines) + '\n'
+        
+        try:
+            for item in iter_stream_samples(stream, fmt):
+                chunk.append(item)
+                if len(chunk) >= STREAM_CHUNK_SIZE:
+                    ok, body = flush()
+                    successful += ok
+                    total += len(chunk)
+                    chunk = []
+                    yield body
+            if chunk:
+                ok, body = flush()
+                successful += ok
+                total += len(chunk)
+                yield body
+        except Exception as e:
+            logger.error(f"❌ Error in stream_predict: {str(e)}", exc_info=True)
+            yield json.dumps({
+                'error': str(e),
+                'status': 'error',
+                'processed_samples': total,
+                'timestamp': datetime.now().isoformat()
+            }) + '\n'
+            return
+        
+        logger.debug(f"✅ Streaming prediction complete: {successful}/{total} successful")
+        yield json.dumps({
+            'summary': {'total_samples': total, 'successful': successful},
+            'timestamp': datetime.now().isoformat(),
+            'status': 'success'
+        }) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/api/predictions/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy' if predictor and predictor.is_loaded else 'degraded',
         'model_loaded': predictor is not None and predictor.is_loaded,
+        'backend': predictor.backend if predictor else None,
+        'mode': predictor.mode if predictor else None,
+        'coalescer': coalescer.stats() if coalescer else None,
+        'cache': predictor.cache.stats() if predictor and predictor.cache else None,
+        'worker_pool': worker_pool.stats() if worker_pool else None,
         'endpoint': '/api/predictions/glucose',
         'timestamp': datetime.now().isoformat()
     }), 200
@@ -286,8 +693,10 @@ def model_info():
         'available_endpoints': {
             'predict': 'POST /api/predictions/glucose',
             'batch_predict': 'POST /api/predictions/batch',
+            'stream_predict': 'POST /api/predictions/stream',
             'health': 'GET /api/predictions/health',
-            'info': 'GET /api/predictions/info'
+            'info': 'GET /api/predictions/info',
+            'metrics': 'GET /metrics'
         },
         'timestamp': datetime.now().isoformat()
     }), 200
@@ -308,12 +717,15 @@ if __name__ == "__main__":
     print("📍 Available endpoints:")
     print("  • POST /api/predictions/glucose    - Single prediction")
     print("  • POST /api/predictions/batch      - Batch predictions")
+    print("  • POST /api/predictions/stream     - Streaming NDJSON/CSV predictions")
     print("  • GET  /api/predictions/health     - Health check")
     print("  • GET  /api/predictions/info       - Model information")
+    print("  • GET  /metrics                    - Prometheus-style metrics")
     print()
     
     port = int(os.environ.get('PORT', 5001))
     print(f"🚀 Starting server on http://localhost:{port}")
+    print("   (development server - use `uvicorn asgi:application` in production)")
     print("=" * 70)
     print()
     
@@ -0,0 +1,208 @@
+"""
+ASGI Entry Point for the Glucose Prediction API
+Serves the Flask routes from app.py on an asyncio server, running each request on a bounded worker pool
+Run: uvicorn asgi:application --host 0.0.0.0 --port 5001
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from typing import Dict
+
+from a2wsgi import WSGIMiddleware
+
+import app as prediction_app
+
+logger = logging.getLogger(__name__)
+
+# Cheap status routes are served outside the admission limit so that health
+# checks and metric scrapes keep answering while the pool is saturated
+UNLIMITED_PATHS = ("/api/predictions/health", "/api/predictions/info", "/metrics")
+
+# Threads serving UNLIMITED_PATHS
+STATUS_WORKERS = 2
+
+
+def _flask_app(environ, start_response):
+    # The bridge's input stream ends with the request body, so Werkzeug may
+    # read chunked uploads that have no Content-Length
+    environ["wsgi.input_terminated"] = True
+    return prediction_app.app(environ, start_response)
+
+
+class WorkerPool:
+    """
+    Admission control in front of a bounded worker thread pool
+
+    At most `workers` requests run at once and at most `max_queue` more wait
+    for a worker; anything beyond that is rejected immediately so the caller
+    can answer 429 instead of queueing without limit. Threads (not processes)
+    share the loaded forests, prediction cache and coalescer, and the forest
+    evaluation in sklearn / NumPy releases the GIL for most of its work, so
+    requests run in parallel across cores.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        """
+        Args:
+            workers: Number of worker threads
+            max_queue: Requests allowed to wait for a free worker
+        """
+        if workers < 1:
+            raise ValueError("workers must be >= 1")
+        if max_queue < 0:
+            raise ValueError("max_queue must be >= 0")
+
+        self.workers = workers
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def try_acquire(self) -> bool:
+        """Reserve a slot for one request; False when the pool is full"""
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queue:
+                self._rejected += 1
+                return False
+            self._in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queued": max(self._in_flight - self.workers, 0),
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+
+async def _send_busy(send):
+    body = (
+        b'{"error": "Server busy: prediction queue is full, retry later", "status": "error"}'
+    )
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", b"1"),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class PredictionASGIApp:
+    """
+    ASGI application serving the Flask prediction routes
+
+    The WSGI bridge (a2wsgi) runs each Flask view (parsing, validation and
+    forest evaluation) on a thread pool of `workers` threads and feeds it the
+    request body as it arrives, so streamed uploads are never buffered whole.
+    When the WorkerPool is full the request is answered with 429 and a
+    Retry-After header without touching the models.
+
+    The predictor is loaded on lifespan startup, or on the first request when
+    the server does not send lifespan events (e.g. uvicorn --lifespan off).
+    """
+
+    def __init__(self, workers: int = None, max_queue: int = None):
+        """
+        Args:
+            workers: Worker threads (default PREDICTION_WORKERS or the CPU count)
+            max_queue: Waiting requests before 429 (default PREDICTION_QUEUE_SIZE or 4 per worker)
+        """
+        if workers is None:
+            workers = int(os.environ.get("PREDICTION_WORKERS", os.cpu_count() or 1))
+        if max_queue is None:
+            max_queue = int(os.environ.get("PREDICTION_QUEUE_SIZE", 4 * workers))
+        self.pool = WorkerPool(workers, max_queue)
+        self._wsgi = WSGIMiddleware(_flask_app, workers=workers)
+        self._status_wsgi = WSGIMiddleware(_flask_app, workers=STATUS_WORKERS)
+        self._started = False
+        self._startup_lock = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _startup(self):
+        """Load the predictor once, whichever of lifespan or the first request comes first"""
+        if self._started:
+            return
+        if self._startup_lock is None:
+            self._startup_lock = asyncio.Lock()
+        async with self._startup_lock:
+            if self._started:
+                return
+            await asyncio.get_running_loop().run_in_executor(None, prediction_app.init_app)
+            prediction_app.worker_pool = self.pool
+            self._started = True
+            logger.info(f"🧵 Worker pool ready ({self.pool.workers} workers, queue {self.pool.max_queue})")
+
+    async def _lifespan(self, receive, send):
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await self._startup()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if prediction_app.coalescer:
+                    prediction_app.coalescer.close()
+                for bridge in (self._wsgi, self._status_wsgi):
+                    await loop.run_in_executor(None, bridge.executor.shutdown)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope, receive, send):
+        await self._startup()
+        path = scope["path"]
+
+        if path in UNLIMITED_PATHS:
+            await self._serve(self._status_wsgi, scope, receive, send)
+            return
+
+        if not self.pool.try_acquire():
+            logger.warning(f"⚠️  Worker pool full, rejecting {scope['method']} {path}")
+            await _send_busy(send)
+            return
+
+        try:
+            await self._serve(self._wsgi, scope, receive, send)
+        finally:
+            self.pool.release()
+
+    async def _serve(self, bridge, scope, receive, send):
+        disconnected = False
+
+        async def guarded_send(message):
+            # Once the client is gone (ConnectionError, or the server's own
+            # OSError such as uvicorn's ClientDisconnected), drop the rest of
+            # the response so the bridge keeps draining and the worker finishes
+            nonlocal disconnected
+            if disconnected:
+                return
+            try:
+                await send(message)
+            except OSError:
+                disconnected = True
+                logger.info(f"📴 Client disconnected during {scope['method']} {scope['path']}")
+
+        await bridge(scope, receive, guarded_send)
+
+
+application = PredictionASGIApp()
@@ -0,0 +1,223 @@
+"""
+Batch Prediction Benchmark
+Compares the legacy per-sample loop against the columnar /api/predictions/batch pipeline,
+and JSON against the binary wire formats
+Run: python benchmark_batch.py [--sizes 1000 10000 100000]
+     python benchmark_batch.py --verify   (compiled vs sklearn parity check only; exits 1 on mismatch)
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+import app
+from compiled_forest import ARTIFACT_EXTENSION, CompiledForest, load_artifact
+from columnar_format import (
+    ARROW_CONTENT_TYPE, COLUMNAR_CONTENT_TYPE, arrow_available,
+    decode_arrow, decode_columns, encode_arrow, encode_columns
+)
+from predictor import FEATURE_KEYS, GlucosePredictor
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(SCRIPT_DIR, "rf_glucose_model.pkl")
+
+# The legacy loop costs tens of milliseconds per row, so it is timed on a
+# subsample and extrapolated linearly for larger batch sizes
+LEGACY_MAX_ROWS = 200
+
+
+def make_samples(n: int, seed: int = 42) -> list:
+    """Generate n sample dicts spread over the accepted input ranges"""
+    rng = np.random.default_rng(seed)
+    return [
+        {"heart_rate": int(hr), "spo2": int(spo2), "gsr": round(float(gsr), 4)}
+        for hr, spo2, gsr in zip(
+            rng.integers(50, 130, n),
+            rng.integers(85, 100, n),
+            rng.uniform(0.2, 1.0, n),
+        )
+    ]
+
+
+def parity_inputs(forest: CompiledForest, n: int, seed: int = 0) -> np.ndarray:
+    """
+    Rows for the compiled/sklearn parity check: uniform over the accepted
+    input ranges, integer-valued (like device readings), and rows with one
+    feature exactly at a split threshold or one float32 step to either side
+    """
+    rng = np.random.default_rng(seed)
+    low = np.array([r[2] for r in app.INPUT_RANGES], dtype=np.float64)
+    high = np.array([r[3] for r in app.INPUT_RANGES], dtype=np.float64)
+    uniform = rng.uniform(low, high, (n, len(low)))
+    integer = np.round(rng.uniform(low, high, (n, len(low))))
+
+    at_threshold = rng.uniform(low, high, (n, len(low)))
+    splits = np.flatnonzero(forest.children[:, 0] != np.arange(len(forest.feature)))
+    nodes = rng.choice(splits, n)
+    values = forest.threshold[nodes].astype(np.float32)
+    step = rng.integers(-1, 2, n)
+    values = np.where(step < 0, np.nextafter(values, np.float32(-np.inf)),
+                      np.where(step > 0, np.nextafter(values, np.float32(np.inf)), values))
+    at_threshold[np.arange(n), forest.feature[nodes]] = values
+    return np.vstack([uniform, integer, at_threshold])
+
+
+def verify_parity(model_path: str, n: int) -> bool:
+    """
+    Check that CompiledForest (compiled from the pickle, and memory-mapped from
+    the .forest artifact if present) reproduces sklearn's predict and
+    predict_proba bit for bit
+
+    Returns:
+        True when every output matches exactly
+    """
+    predictor = GlucosePredictor(model_path, backend="sklearn")
+    if not predictor.is_loaded:
+        print("❌ Models not loaded. Please run train_model.py first.")
+        return False
+    regressor, classifier = predictor.regressor, predictor.classifier
+    # Parallel prediction sums tree outputs in completion order; exact parity holds for n_jobs=1
+    for model in (regressor, classifier):
+        model.set_params(n_jobs=1)
+
+    variants = {"from_sklearn": (CompiledForest.from_sklearn(regressor), CompiledForest.from_sklearn(classifier))}
+    artifact_path = os.path.splitext(model_path)[0] + ARTIFACT_EXTENSION
+    if os.path.exists(artifact_path):
+        models, _ = load_artifact(artifact_path)
+        variants["artifact"] = (models["regressor"], models["classifier"])
+
+    X = parity_inputs(variants["from_sklearn"][0], n // 3)
+    expected_glucose = regressor.predict(X)
+    expected_proba = classifier.predict_proba(X)
+    expected_labels = classifier.predict(X)
+
+    print("=" * 70)
+    print(f"🔍 COMPILED FOREST PARITY ({len(X)} rows)")
+    print("=" * 70)
+    print(f"{'Variant':<14} {'Max glucose diff':>18} {'Max proba diff':>16} {'Label mismatches':>18}")
+    print("-" * 70)
+    ok = True
+    for name, (compiled_regressor, compiled_classifier) in variants.items():
+        glucose_diff = float(np.max(np.abs(compiled_regressor.predict(X) - expected_glucose)))
+        proba_diff = float(np.max(np.abs(compiled_classifier.predict_proba(X) - expected_proba)))
+        mismatches = int(np.sum(compiled_classifier.predict(X).astype(str) != expected_labels.astype(str)))
+        ok &= glucose_diff == 0.0 and proba_diff == 0.0 and mismatches == 0
+        print(f"{name:<14} {glucose_diff:>18.3g} {proba_diff:>16.3g} {mismatches:>18}")
+    print("-" * 70)
+    print("✅ Bit-identical to sklearn" if ok else "❌ Compiled forests diverge from sklearn")
+    print("=" * 70)
+    return ok
+
+
+def time_legacy(predictor: GlucosePredictor, samples: list) -> float:
+    """Seconds per row for the old loop: two single-row calls per sample"""
+    rows = samples[:LEGACY_MAX_ROWS]
+    start = time.perf_counter()
+    for sample in rows:
+        hr, spo2, gsr = float(sample["heart_rate"]), float(sample["spo2"]), float(sample["gsr"])
+        predictor.predict_glucose(hr, spo2, gsr)
+        predictor.predict_diabetes_status(hr, spo2, gsr)
+    return (time.perf_counter() - start) / len(rows)
+
+
+def time_columnar(samples: list) -> float:
+    """Seconds for parse + validate + predict through the app's batch pipeline"""
+    start = time.perf_counter()
+    features, errors = app.parse_sample_columns(samples)
+    valid = app.validate_sample_columns(features, errors)
+    app.predict_sample_columns(features, valid)
+    return time.perf_counter() - start
+
+
+def time_endpoint(client, samples: list) -> float:
+    """Seconds for a full POST /api/predictions/batch including JSON encode/decode"""
+    start = time.perf_counter()
+    response = client.post("/api/predictions/batch", json={"samples": samples})
+    response.get_json()
+    return time.perf_counter() - start
+
+
+def time_format(client, samples: list, fmt: str) -> float:
+    """
+    Seconds for POST /api/predictions/batch in one wire format, including
+    decoding the response. Request bodies are encoded before timing starts.
+    """
+    if fmt == "json":
+        body, content_type = json.dumps({"samples": samples}), "application/json"
+    else:
+        columns = [np.array([sample[key] for sample in samples], dtype=np.float32) for key in FEATURE_KEYS]
+        if fmt == "arrow":
+            body, content_type = encode_arrow(dict(zip(FEATURE_KEYS, columns))), ARROW_CONTENT_TYPE
+        else:
+            body, content_type = encode_columns(columns), COLUMNAR_CONTENT_TYPE
+
+    start = time.perf_counter()
+    response = client.post("/api/predictions/batch", data=body, content_type=content_type)
+    if fmt == "json":
+        response.get_json()
+    elif fmt == "arrow":
+        decode_arrow(response.data, ["glucose_prediction", "status_confidence"])
+    else:
+        decode_columns(response.data)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch glucose predictions")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--verify", action="store_true",
+                        help="Only check compiled/sklearn parity and exit non-zero on any mismatch")
+    parser.add_argument("--verify-rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    if args.verify:
+        sys.exit(0 if verify_parity(args.model_path, args.verify_rows) else 1)
+
+    predictor = GlucosePredictor(args.model_path)
+    if not predictor.is_loaded:
+        print("❌ Models not loaded. Please run train_model.py first.")
+        exit(1)
+    app.predictor = predictor
+    client = app.app.test_client()
+
+    print("=" * 70)
+    print("⏱️  BATCH PREDICTION BENCHMARK")
+    print("=" * 70)
+    print(f"{'Samples':>10} {'Legacy (s)*':>14} {'Columnar (s)':>14} {'Endpoint (s)':>14} {'Speedup':>10}")
+    print("-" * 70)
+
+    for n in args.sizes:
+        samples = make_samples(n)
+        legacy = time_legacy(predictor, samples) * n
+        columnar = time_columnar(samples)
+        endpoint = time_endpoint(client, samples)
+        print(f"{n:>10} {legacy:>14.3f} {columnar:>14.3f} {endpoint:>14.3f} {legacy / columnar:>9.1f}x")
+
+    print("-" * 70)
+    print(f"* Legacy timed on {LEGACY_MAX_ROWS} rows and extrapolated linearly")
+    print("=" * 70)
+    print()
+
+    formats = ["json", "columnar"] + (["arrow"] if arrow_available() else [])
+    print("📦 WIRE FORMATS (POST /api/predictions/batch, seconds)")
+    print("-" * 70)
+    print(f"{'Samples':>10}" + "".join(f"{fmt:>14}" for fmt in formats) + f"{'JSON/columnar':>16}")
+    print("-" * 70)
+    for n in args.sizes:
+        samples = make_samples(n)
+        timings = {fmt: time_format(client, samples, fmt) for fmt in formats}
+        print(f"{n:>10}" + "".join(f"{timings[fmt]:>14.3f}" for fmt in formats)
+              + f"{timings['json'] / timings['columnar']:>15.1f}x")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Micro-batching Request Coalescer
+Groups concurrent single predictions into one matrix evaluation of the forests
+"""
+
+import queue
+import threading
+import time
+from typing import Dict
+
+import numpy as np
+
+from predictor import GlucosePredictor
+
+# Upper bounds (ms) of the queueing-delay histogram buckets
+QUEUE_DELAY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100)
+
+
+class _PendingPrediction:
+    """A single request waiting in the coalescing queue"""
+
+    __slots__ = ("features", "generation", "enqueued_at", "done", "result", "error")
+
+    def __init__(self, features, generation=None):
+        self.features = features
+        self.generation = generation
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class PredictionCoalescer:
+    """
+    Collect concurrent predict_full calls and evaluate them as one batch
+
+    A background worker takes the first waiting request, keeps collecting
+    until window_ms has passed since that request arrived or max_batch_size
+    requests are queued, then runs GlucosePredictor.predict_arrays once and
+    hands each caller its own row. Exposes the same predict_full signature as
+    GlucosePredictor so callers can use either interchangeably, including the
+    predictor's prediction cache (hits never enter the queue).
+    """
+
+    def __init__(self, predictor: GlucosePredictor, window_ms: float = 2.0,
+                 max_batch_size: int = 64):
+        """
+        Args:
+            predictor: Loaded GlucosePredictor used for evaluation
+            window_ms: Maximum time to hold the first request while collecting more
+            max_batch_size: Evaluate as soon as this many requests are queued
+        """
+        if window_ms < 0:
+            raise ValueError("window_ms must be >= 0")
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+
+        self.predictor = predictor
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+        self._batch_sizes = {}
+        self._delay_sum_ms = 0.0
+        self._delay_max_ms = 0.0
+        self._delay_buckets = [0] * (len(QUEUE_DELAY_BUCKETS_MS) + 1)
+
+        self._worker = threading.Thread(
+            target=self._run, name="prediction-coalescer", daemon=True
+        )
+        self._worker.start()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.predictor.is_loaded
+
+    def predict_full(self, heart_rate: float, spo2: float, gsr: float,
+                     timeout: float = 30.0) -> Dict:
+        """
+        Queue one prediction and block until its batch has been evaluated
+
+        Returns:
+            Same dict as GlucosePredictor.predict_full
+        """
+        cached = self.predictor.lookup_cached(heart_rate, spo2, gsr)
+        if cached is not None:
+            return cached
+
+        cache = self.predictor.cache
+        pending = _PendingPrediction(
+            (heart_rate, spo2, gsr), cache.generation if cache is not None else None
+        )
+        self._queue.put(pending)
+        if not pending.done.wait(timeout):
+            raise TimeoutError(f"Prediction not completed within {timeout}s")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def close(self):
+        """Stop the worker after it finishes the requests already queued"""
+        self._queue.put(None)
+        self._worker.join()
+
+    def stats(self) -> Dict:
+        """Batch-size distribution and queueing-delay metrics"""
+        with self._stats_lock:
+            histogram = {}
+            for upper, count in zip(QUEUE_DELAY_BUCKETS_MS, self._delay_buckets):
+                histogram[f"le_{upper}"] = count
+            histogram["le_inf"] = self._delay_buckets[-1]
+            return {
+                "window_ms": self.window_ms,
+                "max_batch_size": self.max_batch_size,
+                "batches": self._batches,
+                "requests": self._requests,
+                "mean_batch_size": round(self._requests / self._batches, 2) if self._batches else 0.0,
+                "batch_size_distribution": dict(sorted(self._batch_sizes.items())),
+                "queue_delay_ms": {
+                    "mean": round(self._delay_sum_ms / self._requests, 3) if self._requests else 0.0,
+                    "max": round(self._delay_max_ms, 3),
+                    "histogram": histogram,
+                },
+            }
+
+    def _run(self):
+        window = self.window_ms / 1000.0
+        stopping = False
+
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+
+            batch = [first]
+            deadline = first.enqueued_at + window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._evaluate(batch)
+
+    def _evaluate(self, batch):
+        started = time.perf_counter()
+        self._record(batch, started)
+
+        try:
+            features = np.array([pending.features for pending in batch], dtype=np.float64)
+            glucose, status, confidence = self.predictor.predict_arrays(features)
+            for i, pending in enumerate(batch):
+                self.predictor.store_cached(
+                    *pending.features, glucose[i], status[i], confidence[i], pending.generation
+                )
+                pending.result = GlucosePredictor.format_result(
+                    glucose[i], status[i], confidence[i], *pending.features
+                )
+        except Exception as e:
+            for pending in batch:
+                pending.error = e
+        finally:
+            for pending in batch:
+                pending.done.set()
+
+    def _record(self, batch, started):
+        with self._stats_lock:
+            self._batches += 1
+            self._requests += len(batch)
+            self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+            for pending in batch:
+                delay_ms = (started - pending.enqueued_at) * 1000.0
+                self._delay_sum_ms += delay_ms
+                self._delay_max_ms = max(self._delay_max_ms, delay_ms)
+                bucket = np.searchsorted(QUEUE_DELAY_BUCKETS_MS, delay_ms)
+                self._delay_buckets[bucket] += 1
@@ -0,0 +1,107 @@
+"""
+Binary Columnar Wire Format for Batch Predictions
+Encodes/decodes float32 column batches so request bodies map straight onto NumPy arrays
+
+Layout (all little-endian):
+    4 bytes magic b"DSCF" | uint16 version | uint16 column count |
+    uint32 row count | uint32 reserved (0)
+    followed by each column as row-count float32 values, column after column.
+
+Apache Arrow IPC streams are also supported when pyarrow is installed.
+"""
+
+import struct
+from typing import Dict, Sequence
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError:  # optional dependency
+    pa = None
+
+COLUMNAR_CONTENT_TYPE = "application/vnd.diasense.columnar"
+ARROW_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+
+COLUMNAR_MAGIC = b"DSCF"
+COLUMNAR_VERSION = 1
+_HEADER = struct.Struct("<4sHHII")
+_DTYPE = np.dtype("<f4")
+
+
+def arrow_available() -> bool:
+    return pa is not None
+
+
+def encode_columns(columns: Sequence[np.ndarray]) -> bytes:
+    """
+    Encode equal-length columns as one columnar message
+
+    Args:
+        columns: 1-D arrays, converted to little-endian float32
+
+    Returns:
+        Header followed by the raw column data
+    """
+    n_rows = len(columns[0]) if columns else 0
+    if any(len(column) != n_rows for column in columns):
+        raise ValueError("All columns must have the same length")
+    header = _HEADER.pack(COLUMNAR_MAGIC, COLUMNAR_VERSION, len(columns), n_rows, 0)
+    data = np.empty((len(columns), n_rows), dtype=_DTYPE)
+    for i, column in enumerate(columns):
+        data[i] = column
+    return header + data.tobytes()
+
+
+def decode_columns(body: bytes) -> np.ndarray:
+    """
+    Decode a columnar message without copying the column data
+
+    Args:
+        body: Bytes produced by encode_columns
+
+    Returns:
+        Read-only float32 array of shape (n_columns, n_rows) viewing body
+    """
+    if len(body) < _HEADER.size:
+        raise ValueError("Body is shorter than the columnar header")
+    magic, version, n_columns, n_rows, _ = _HEADER.unpack_from(body)
+    if magic != COLUMNAR_MAGIC:
+        raise ValueError("Body is not in the columnar format (bad magic)")
+    if version != COLUMNAR_VERSION:
+        raise ValueError(f"Unsupported columnar version {version} (expected {COLUMNAR_VERSION})")
+    expected = _HEADER.size + n_columns * n_rows * _DTYPE.itemsize
+    if len(body) != expected:
+        raise ValueError(f"Expected {expected} bytes for {n_columns}x{n_rows} columns, got {len(body)}")
+    return np.frombuffer(body, dtype=_DTYPE, count=n_columns * n_rows,
+                         offset=_HEADER.size).reshape(n_columns, n_rows)
+
+
+def decode_arrow(body: bytes, names: Sequence[str]) -> np.ndarray:
+    """
+    Read the named numeric columns from an Arrow IPC stream
+
+    Returns:
+        Float array of shape (len(names), n_rows); nulls become NaN
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed")
+    table = pa.ipc.open_stream(body).read_all()
+    missing = [name for name in names if name not in table.column_names]
+    if missing:
+        raise ValueError(f"Missing required columns: {missing}")
+    return np.stack([
+        table.column(name).to_numpy(zero_copy_only=False).astype(np.float64, copy=False)
+        for name in names
+    ])
+
+
+def encode_arrow(columns: Dict[str, np.ndarray]) -> bytes:
+    """Write named columns as a single-batch Arrow IPC stream"""
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed")
+    table = pa.table(columns)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
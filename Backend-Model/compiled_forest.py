@@ -0,0 +1,310 @@
+"""
+Compiled RandomForest Inference Backend
+Flattens fitted sklearn forests into contiguous node tables and walks all trees at once
+"""
+
+import json
+import os
+import struct
+import numpy as np
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+# Upper bound on (rows x trees) node indices held in memory per traversal chunk
+_CHUNK_CELLS = 1 << 18
+
+# Binary artifact layout (all little-endian):
+#   8 bytes magic | uint32 format version | uint32 header length | JSON header
+#   followed by the raw node-table arrays, each starting on a 64-byte boundary.
+# The header records dtype, shape and absolute offset for every array so they
+# can be memory-mapped read-only and shared between processes via the page cache.
+ARTIFACT_MAGIC = b"DSFOREST"
+ARTIFACT_VERSION = 1
+ARTIFACT_EXTENSION = ".forest"
+_PREAMBLE = struct.Struct("<8sII")
+_ALIGNMENT = 64
+_ARRAY_FIELDS = ("feature", "threshold", "children", "values", "roots")
+
+
+class CompiledForest:
+    """
+    Array-backed copy of a fitted RandomForestRegressor / RandomForestClassifier
+
+    Every tree is stored in one set of flat arrays (feature index, threshold,
+    child offsets, leaf values), with leaves pointing to themselves so a fixed
+    number of vectorized steps walks all trees for all rows.
+
+    Predictions are bit-identical to sklearn run with n_jobs=1: inputs are
+    compared as float32 like sklearn's tree code, and tree outputs are summed
+    in estimator order before dividing by the number of trees. Inputs must be
+    finite; the API layer rejects NaN/inf before prediction.
+    """
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray,
+                 children: np.ndarray, values: np.ndarray,
+                 roots: np.ndarray, max_depth: int,
+                 classes: Optional[np.ndarray] = None):
+        """
+        Args:
+            feature: Split feature index per node (int32)
+            threshold: Split threshold per node (float64)
+            children: Global (left, right) child indices per node, shape
+                (nodes, 2) int32; leaves point to themselves
+            values: Per-node output, shape (nodes,) for regression or
+                (nodes, n_classes) class probabilities for classification
+            roots: Global index of each tree's root node (int32)
+            max_depth: Maximum depth over all trees
+            classes: Class labels for classifiers, None for regressors
+        """
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        # Flat view so the child of node n is _next[2 * n + went_right]
+        self._next = children.reshape(-1)
+        self.values = values
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.classes_ = classes
+        self.n_estimators = len(roots)
+
+    @property
+    def is_classifier(self) -> bool:
+        return self.classes_ is not None
+
+    @classmethod
+    def from_sklearn(cls, forest) -> "CompiledForest":
+        """
+        Compile a fitted sklearn RandomForestRegressor or RandomForestClassifier
+
+        Args:
+            forest: Fitted forest with a single output
+
+        Returns:
+            CompiledForest with the same predictions
+        """
+        import sklearn
+
+        classes = getattr(forest, "classes_", None)
+        # sklearn < 1.4 stores weighted class counts in tree_.value and
+        # normalizes them in predict_proba; newer versions store fractions
+        normalize = classes is not None and tuple(
+            int(part) for part in sklearn.__version__.split(".")[:2]
+        ) < (1, 4)
+
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(offset, offset + n_nodes)
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            children.append(np.column_stack([
+                np.where(is_leaf, node_ids, tree.children_left + offset),
+                np.where(is_leaf, node_ids, tree.children_right + offset),
+            ]))
+
+            if classes is None:
+                values.append(tree.value[:, 0, 0])
+            else:
+                proba = tree.value[:, 0, :len(classes)]
+                if normalize:
+                    normalizer = proba.sum(axis=1)[:, np.newaxis]
+                    normalizer[normalizer == 0.0] = 1.0
+                    proba = proba / normalizer
+                values.append(proba)
+
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n_nodes
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.int32),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            children=np.ascontiguousarray(np.concatenate(children), dtype=np.int32),
+            values=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=max_depth,
+            classes=None if classes is None else np.asarray(classes),
+        )
+
+    def apply(self, X) -> np.ndarray:
+        """
+        Find the leaf reached in every tree
+
+        Args:
+            X: Array of shape (N, n_features)
+
+        Returns:
+            Global leaf node indices, shape (N, n_estimators)
+        """
+        X = self._as_input(X)
+        leaves = np.empty((X.shape[0], self.n_estimators), dtype=np.int32)
+        for start, X_chunk in self._row_chunks(X):
+            leaves[start:start + X_chunk.shape[0]] = self._apply_chunk(X_chunk)
+        return leaves
+
+    @staticmethod
+    def _as_input(X) -> np.ndarray:
+        # sklearn casts inputs to float32 before comparing to float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2:
+            raise ValueError(f"Expected a 2D array, got shape {X.shape}")
+        return X
+
+    def _row_chunks(self, X):
+        """(start row, rows) pairs of at most _CHUNK_CELLS (row, tree) cells each"""
+        chunk = max(1, _CHUNK_CELLS // self.n_estimators)
+        for start in range(0, X.shape[0], chunk):
+            yield start, X[start:start + chunk]
+
+    def _apply_chunk(self, X_chunk) -> np.ndarray:
+        n_rows, n_features = X_chunk.shape
+        flat = X_chunk.reshape(-1)
+        row_base = (np.arange(n_rows, dtype=np.int32) * n_features)[:, np.newaxis]
+        nodes = np.broadcast_to(self.roots, (n_rows, self.n_estimators))
+        for _ in range(self.max_depth):
+            went_right = flat[row_base + self.feature[nodes]] > self.threshold[nodes]
+            nodes = self._next[2 * nodes + went_right]
+        return nodes
+
+    def _mean_over_trees(self, X) -> np.ndarray:
+        # Sequential accumulation in estimator order, matching sklearn's
+        # `out += prediction` loop, then a single division. Tree outputs are
+        # gathered one row chunk at a time so memory stays bounded by
+        # _CHUNK_CELLS whatever the batch size
+        X = self._as_input(X)
+        out = np.empty((X.shape[0],) + self.values.shape[1:], dtype=np.float64)
+        for start, X_chunk in self._row_chunks(X):
+            per_tree = self.values[self._apply_chunk(X_chunk)]
+            out[start:start + X_chunk.shape[0]] = np.cumsum(per_tree, axis=1)[:, -1]
+        return out / self.n_estimators
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Class probabilities, shape (N, n_classes)"""
+        if not self.is_classifier:
+            raise AttributeError("predict_proba is only available for classifiers")
+        return self._mean_over_trees(X)
+
+    def predict(self, X) -> np.ndarray:
+        """Mean regression output, or the most probable class label"""
+        if self.is_classifier:
+            return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+        return self._mean_over_trees(X)
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def save_artifact(path: str, models: Dict[str, CompiledForest]) -> Dict:
+    """
+    Write compiled forests to a versioned, memory-mappable binary artifact
+
+    The file is written next to the target and renamed into place, so readers
+    never see a partially written artifact.
+
+    Args:
+        path: Destination file (conventionally *.forest)
+        models: Mapping of model name (e.g. "regressor") to CompiledForest
+
+    Returns:
+        The header dict written to the file
+    """
+    header = {
+        "format_version": ARTIFACT_VERSION,
+        "created": datetime.now().isoformat(),
+        "models": {},
+    }
+    arrays = []
+
+    # Offsets depend on the header length, so lay out relative offsets first
+    offset = 0
+    for name, forest in models.items():
+        entry = {
+            "max_depth": forest.max_depth,
+            "classes": None if forest.classes_ is None else [str(c) for c in forest.classes_],
+            "arrays": {},
+        }
+        for field in _ARRAY_FIELDS:
+            array = np.ascontiguousarray(getattr(forest, field))
+            array = array.astype(array.dtype.newbyteorder("<"), copy=False)
+            offset = _align(offset)
+            entry["arrays"][field] = {
+                "dtype": array.dtype.str,
+                "shape": list(array.shape),
+                "offset": offset,
+            }
+            arrays.append((offset, array))
+            offset += array.nbytes
+        header["models"][name] = entry
+
+    # Offsets in the header are absolute, and the data start depends on the
+    # header length, so iterate until the layout is stable
+    relative = {
+        (name, field): spec["offset"]
+        for name, entry in header["models"].items()
+        for field, spec in entry["arrays"].items()
+    }
+    data_start = 0
+    while True:
+        for (name, field), rel in relative.items():
+            header["models"][name]["arrays"][field]["offset"] = data_start + rel
+        header_bytes = json.dumps(header).encode("utf-8")
+        needed = _align(_PREAMBLE.size + len(header_bytes))
+        if needed == data_start:
+            break
+        data_start = needed
+    header_bytes = header_bytes.ljust(data_start - _PREAMBLE.size, b" ")
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREAMBLE.pack(ARTIFACT_MAGIC, ARTIFACT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for array_offset, array in arrays:
+            f.seek(data_start + array_offset)
+            f.write(array.tobytes())
+    os.replace(tmp_path, path)
+
+    return header
+
+
+def load_artifact(path: str) -> Tuple[Dict[str, CompiledForest], Dict]:
+    """
+    Memory-map a binary artifact written by save_artifact
+
+    Args:
+        path: Artifact file path
+
+    Returns:
+        Tuple of (models, header) where models maps name to CompiledForest
+        backed by read-only memory maps of the file
+    """
+    with open(path, "rb") as f:
+        magic, version, header_len = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+        if magic != ARTIFACT_MAGIC:
+            raise ValueError(f"{path} is not a forest artifact")
+        if version != ARTIFACT_VERSION:
+            raise ValueError(
+                f"Unsupported artifact version {version} (expected {ARTIFACT_VERSION})"
+            )
+        header = json.loads(f.read(header_len))
+
+    models = {}
+    for name, entry in header["models"].items():
+        arrays = {
+            field: np.memmap(path, dtype=np.dtype(spec["dtype"]), mode="r",
+                             offset=spec["offset"], shape=tuple(spec["shape"]))
+            for field, spec in entry["arrays"].items()
+        }
+        classes = entry["classes"]
+        models[name] = CompiledForest(
+            max_depth=entry["max_depth"],
+            classes=None if classes is None else np.asarray(classes, dtype=object),
+            **arrays,
+        )
+    return models, header
@@ -0,0 +1,292 @@
+"""
+Dense Lookup Grid - Approximate O(1) Inference
+Precomputes both forests over a 3-D (HeartRate, SpO2, GSR) grid and answers by lookup
+Run: python grid_lookup.py [--hr-step 1] [--spo2-step 1] [--gsr-step 0.005]
+"""
+
+import argparse
+import json
+import os
+import numpy as np
+from typing import Dict, Optional, Sequence, Tuple
+
+INTERPOLATIONS = ("nearest", "linear")
+GRID_EXTENSION = ".grid.npz"
+
+# Default grid spacing per feature (HeartRate BPM, SpO2 %, GSR microsiemens)
+DEFAULT_STEPS = (1.0, 1.0, 0.005)
+
+
+class _GridRegressor:
+    """Regressor-shaped view of a GridLookup (predict -> glucose)"""
+
+    def __init__(self, grid: "GridLookup"):
+        self._grid = grid
+
+    def predict(self, X) -> np.ndarray:
+        return self._grid.lookup(self._grid.glucose, X)
+
+
+class _GridClassifier:
+    """Classifier-shaped view of a GridLookup (predict_proba / predict / classes_)"""
+
+    def __init__(self, grid: "GridLookup"):
+        self._grid = grid
+        self.classes_ = grid.classes
+
+    def predict_proba(self, X) -> np.ndarray:
+        return self._grid.lookup(self._grid.probabilities, X)
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+
+class GridLookup:
+    """
+    Forest outputs sampled on a regular 3-D grid
+
+    Inputs are clamped to the grid bounds, then answered by nearest-point
+    indexing or trilinear interpolation. When the bounds enclose every split
+    threshold of both forests (the default from build_grid), clamping is
+    exact: the forests are constant beyond their outermost thresholds.
+    """
+
+    def __init__(self, origin: Sequence[float], step: Sequence[float],
+                 glucose: np.ndarray, probabilities: np.ndarray,
+                 classes: np.ndarray, interpolation: str = "nearest",
+                 report: Optional[Dict] = None):
+        """
+        Args:
+            origin: Grid coordinate of index (0, 0, 0) per feature
+            step: Grid spacing per feature
+            glucose: Regressor output, shape (n_hr, n_spo2, n_gsr)
+            probabilities: Class probabilities, shape (n_hr, n_spo2, n_gsr, n_classes)
+            classes: Class labels matching the last axis of probabilities
+            interpolation: "nearest" or "linear" (trilinear)
+            report: Deviation report recorded when the grid was built
+        """
+        if interpolation not in INTERPOLATIONS:
+            raise ValueError(f"Unknown interpolation '{interpolation}'. Expected one of {INTERPOLATIONS}")
+
+        self.origin = np.asarray(origin, dtype=np.float64)
+        self.step = np.asarray(step, dtype=np.float64)
+        self.glucose = glucose
+        self.probabilities = probabilities
+        self.classes = np.asarray(classes, dtype=object)
+        self.interpolation = interpolation
+        self.report = report or {}
+        self.shape = np.asarray(glucose.shape, dtype=np.int64)
+        self.upper = self.origin + (self.shape - 1) * self.step
+
+        self.regressor = _GridRegressor(self)
+        self.classifier = _GridClassifier(self)
+
+    def lookup(self, table: np.ndarray, X) -> np.ndarray:
+        """Evaluate a grid table (glucose or probabilities) at the rows of X"""
+        X = np.asarray(X, dtype=np.float64)
+        coords = (np.clip(X, self.origin, self.upper) - self.origin) / self.step
+
+        if self.interpolation == "nearest":
+            idx = np.rint(coords).astype(np.int64)
+            return table[idx[:, 0], idx[:, 1], idx[:, 2]].astype(np.float64)
+
+        # Trilinear: blend the 8 surrounding grid points
+        base = np.minimum(np.floor(coords).astype(np.int64), self.shape - 2)
+        frac = coords - base
+        result = 0.0
+        for corner in range(8):
+            offset = np.array([(corner >> 2) & 1, (corner >> 1) & 1, corner & 1])
+            weight = np.prod(np.where(offset, frac, 1.0 - frac), axis=1)
+            idx = base + offset
+            values = table[idx[:, 0], idx[:, 1], idx[:, 2]].astype(np.float64)
+            if values.ndim > 1:
+                weight = weight[:, np.newaxis]
+            result = result + weight * values
+        return result
+
+    def save(self, path: str):
+        """Write the grid to a compressed .npz file"""
+        np.savez_compressed(
+            path,
+            origin=self.origin,
+            step=self.step,
+            glucose=self.glucose,
+            probabilities=self.probabilities,
+            classes=np.asarray([str(c) for c in self.classes]),
+            report=np.asarray(json.dumps(self.report)),
+        )
+
+    @classmethod
+    def load(cls, path: str, interpolation: str = "nearest") -> "GridLookup":
+        """Load a grid written by save()"""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                origin=data["origin"],
+                step=data["step"],
+                glucose=data["glucose"],
+                probabilities=data["probabilities"],
+                classes=data["classes"].tolist(),
+                interpolation=interpolation,
+                report=json.loads(str(data["report"])),
+            )
+
+
+def threshold_bounds(forests, n_features: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Lowest and highest split threshold per feature over CompiledForests
+
+    Returns:
+        Tuple of (low, high) arrays of length n_features
+    """
+    low = np.full(n_features, np.inf)
+    high = np.full(n_features, -np.inf)
+    for forest in forests:
+        internal = forest.children[:, 0] != np.arange(len(forest.children))
+        features = np.asarray(forest.feature)[internal]
+        thresholds = np.asarray(forest.threshold)[internal]
+        for f in range(n_features):
+            used = thresholds[features == f]
+            if len(used):
+                low[f] = min(low[f], used.min())
+                high[f] = max(high[f], used.max())
+    return low, high
+
+
+def build_grid(predictor, steps: Sequence[float] = DEFAULT_STEPS,
+               bounds: Optional[Sequence[Tuple[float, float]]] = None,
+               chunk_size: int = 65536) -> GridLookup:
+    """
+    Evaluate the predictor's exact forests over a regular grid
+
+    Args:
+        predictor: Loaded GlucosePredictor (exact mode)
+        steps: Grid spacing per feature
+        bounds: Optional (low, high) per feature; defaults to the range of the
+            forests' split thresholds, snapped outward to the step
+
+    Returns:
+        GridLookup with float32 tables
+    """
+    steps = np.asarray(steps, dtype=np.float64)
+    if bounds is None:
+        from compiled_forest import CompiledForest
+
+        forests = [
+            model if isinstance(model, CompiledForest) else CompiledForest.from_sklearn(model)
+            for model in predictor.exact_models()
+        ]
+        low, high = threshold_bounds(forests)
+        # Features a forest never splits on get a single step of range
+        unused = ~np.isfinite(low)
+        low[unused], high[unused] = 0.0, 0.0
+        low = np.floor(low / steps) * steps
+        high = (np.floor(high / steps) + 1) * steps
+    else:
+        low = np.asarray([b[0] for b in bounds], dtype=np.float64)
+        high = np.asarray([b[1] for b in bounds], dtype=np.float64)
+
+    counts = np.maximum(np.rint((high - low) / steps).astype(np.int64) + 1, 2)
+    axes = [low[f] + steps[f] * np.arange(counts[f]) for f in range(3)]
+    points = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, 3)
+
+    glucose = np.empty(len(points), dtype=np.float32)
+    probabilities = None
+    for start in range(0, len(points), chunk_size):
+        chunk = points[start:start + chunk_size]
+        chunk_glucose, chunk_proba, classes = predictor.predict_outputs(chunk)
+        if probabilities is None:
+            probabilities = np.empty((len(points), chunk_proba.shape[1]), dtype=np.float32)
+        glucose[start:start + chunk_size] = chunk_glucose
+        probabilities[start:start + chunk_size] = chunk_proba
+
+    return GridLookup(
+        origin=low,
+        step=steps,
+        glucose=glucose.reshape(tuple(counts)),
+        probabilities=probabilities.reshape(tuple(counts) + (-1,)),
+        classes=classes,
+    )
+
+
+def deviation_report(predictor, grid: GridLookup, samples: np.ndarray) -> Dict:
+    """
+    Compare grid answers against the exact forests
+
+    Returns:
+        Per interpolation mode: max / RMS glucose error (mg/dL), status
+        agreement rate and max confidence error
+    """
+    glucose, probabilities, classes = predictor.predict_outputs(samples)
+    status = np.asarray(classes).take(np.argmax(probabilities, axis=1))
+    confidence = probabilities.max(axis=1)
+
+    report = {"samples": int(len(samples))}
+    for interpolation in INTERPOLATIONS:
+        grid.interpolation = interpolation
+        grid_glucose = grid.regressor.predict(samples)
+        grid_proba = grid.classifier.predict_proba(samples)
+        grid_status = grid.classes.take(np.argmax(grid_proba, axis=1))
+        error = grid_glucose - glucose
+        report[interpolation] = {
+            "glucose_max_abs_error": float(np.max(np.abs(error))),
+            "glucose_rms_error": float(np.sqrt(np.mean(error ** 2))),
+            "status_agreement": float(np.mean(grid_status == status)),
+            "confidence_max_abs_error": float(np.max(np.abs(grid_proba.max(axis=1) - confidence))),
+        }
+    grid.interpolation = "nearest"
+    return report
+
+
+# ============================================================================
+# BUILD TOOL
+# ============================================================================
+if __name__ == "__main__":
+    from predictor import GlucosePredictor
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Precompute the dense lookup grid")
+    parser.add_argument("--model-path", default=os.path.join(script_dir, "rf_glucose_model.pkl"))
+    parser.add_argument("--output", default=None, help=f"Defaults to <model stem>{GRID_EXTENSION}")
+    parser.add_argument("--hr-step", type=float, default=DEFAULT_STEPS[0])
+    parser.add_argument("--spo2-step", type=float, default=DEFAULT_STEPS[1])
+    parser.add_argument("--gsr-step", type=float, default=DEFAULT_STEPS[2])
+    parser.add_argument("--samples", type=int, default=20000,
+                        help="Random points used to measure deviation from the exact forests")
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.model_path)[0] + GRID_EXTENSION
+
+    print("=" * 70)
+    print("🧊 DENSE LOOKUP GRID BUILD")
+    print("=" * 70)
+
+    predictor = GlucosePredictor(args.model_path, backend="auto")
+    if not predictor.is_loaded:
+        print("❌ Models not loaded. Please run train_model.py first.")
+        exit(1)
+
+    grid = build_grid(predictor, steps=(args.hr_step, args.spo2_step, args.gsr_step))
+    print(f"   Grid shape (HR x SpO2 x GSR): {tuple(int(n) for n in grid.shape)}")
+    for name, low, high, step in zip(("HeartRate", "SpO2", "GSR"), grid.origin, grid.upper, grid.step):
+        print(f"     • {name}: {low:g} - {high:g} (step {step:g})")
+
+    # Deviation is measured where the forests actually vary (inside the grid);
+    # inputs outside it are clamped, which is exact
+    rng = np.random.default_rng(42)
+    samples = rng.uniform(grid.origin, grid.upper, size=(args.samples, 3))
+    grid.report = deviation_report(predictor, grid, samples)
+
+    print()
+    print(f"📊 Deviation from exact forests ({args.samples} random points inside the grid):")
+    for interpolation in INTERPOLATIONS:
+        stats = grid.report[interpolation]
+        print(f"   {interpolation}:")
+        print(f"     • Glucose max |error|: {stats['glucose_max_abs_error']:.3f} mg/dL")
+        print(f"     • Glucose RMS error:   {stats['glucose_rms_error']:.3f} mg/dL")
+        print(f"     • Status agreement:    {stats['status_agreement'] * 100:.2f}%")
+        print(f"     • Confidence max |error|: {stats['confidence_max_abs_error']:.4f}")
+
+    grid.save(output)
+    print()
+    print(f"💾 Grid saved to {output} ({os.path.getsize(output) / 1024:.2f} KB)")
+    print("=" * 70)
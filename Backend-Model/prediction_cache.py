@@ -0,0 +1,114 @@
+"""
+Prediction Cache
+Bounded LRU/TTL cache of forest outputs keyed on quantized vital-sign inputs
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache with per-entry TTL for (glucose, status, confidence)
+
+    Heart rate and SpO2 are keyed on their exact values (devices report them
+    as integers). GSR is quantized to gsr_resolution, so readings closer than
+    the resolution share an entry; a resolution of 0 keys on the exact value.
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 300.0, gsr_resolution: float = 0.0):
+        """
+        Args:
+            maxsize: Maximum number of entries before the least recently used is evicted
+            ttl: Seconds an entry stays valid (0 or less disables expiry)
+            gsr_resolution: GSR quantization step in microsiemens (0 for exact keys)
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be >= 1")
+        if gsr_resolution < 0:
+            raise ValueError("gsr_resolution must be >= 0")
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.gsr_resolution = gsr_resolution
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by clear(); puts computed against an older generation are dropped
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def key(self, heart_rate: float, spo2: float, gsr: float) -> Tuple:
+        """Quantized cache key for one input point"""
+        if self.gsr_resolution > 0:
+            gsr = round(gsr / self.gsr_resolution)
+        return (float(heart_rate), float(spo2), gsr)
+
+    def get(self, heart_rate: float, spo2: float, gsr: float) -> Optional[Tuple]:
+        """Return the cached (glucose, status, confidence) or None"""
+        key = self.key(heart_rate, spo2, gsr)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at is not None and now >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, heart_rate: float, spo2: float, gsr: float, value: Tuple,
+            generation: Optional[int] = None):
+        """
+        Store a (glucose, status, confidence) tuple
+
+        Args:
+            generation: Value of self.generation read before the prediction was
+                computed; the put is ignored if the cache was cleared since
+        """
+        key = self.key(heart_rate, spo2, gsr)
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else None
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry, e.g. after the models changed"""
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+            self.invalidations += 1
+
+    def stats(self) -> Dict:
+        """Hit/miss/eviction counters and current occupancy"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "gsr_resolution": self.gsr_resolution,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
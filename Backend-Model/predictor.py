@@ -5,45 +5,255 @@ Load trained models and make predictions on new data
 
 import pickle
 import os
+import threading
+import time
 import numpy as np
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
+
+from compiled_forest import ARTIFACT_EXTENSION, CompiledForest, load_artifact
+from grid_lookup import GRID_EXTENSION, GridLookup
+from prediction_cache import PredictionCache
+
+# Input feature order expected by both forests (HeartRate, SpO2, GSR)
+FEATURE_KEYS = ("heart_rate", "spo2", "gsr")
+
+# Inference backends:
+#   sklearn  - the pickled sklearn forests
+#   compiled - CompiledForest node tables (much lower per-call overhead)
+#   auto     - compiled up to AUTO_COMPILED_MAX_ROWS rows, sklearn above that
+#              (the pickle is only loaded when the first such batch arrives)
+BACKENDS = ("sklearn", "compiled", "auto")
+AUTO_COMPILED_MAX_ROWS = 256
+
+# Prediction modes:
+#   exact - evaluate the forests (through the selected backend)
+#   grid  - approximate O(1) lookup in the precomputed grid from grid_lookup.py
+MODES = ("exact", "grid")
+
+# Minimum seconds between checks of the model files for changes
+MODEL_CHECK_INTERVAL = 1.0
+
 
 class GlucosePredictor:
     """Load and use trained glucose prediction models"""
     
-    def __init__(self, model_path: str = None):
+    def __init__(self, model_path: str = None, backend: str = "sklearn",
+                 cache_size: int = 0, cache_ttl: float = 300.0,
+                 cache_gsr_resolution: float = 0.0, mode: str = "exact",
+                 grid_interpolation: str = "nearest"):
         """
         Initialize the predictor with trained models
         
         Args:
-            model_path: Path to the pickled model file (rf_glucose_model.pkl)
+            model_path: Path to the pickled model file (rf_glucose_model.pkl).
+                A binary artifact with the same stem (rf_glucose_model.forest)
+                is used for the compiled tables when present.
+            backend: Inference backend, one of BACKENDS
+            cache_size: Max entries in the predict_full cache (0 disables caching)
+            cache_ttl: Seconds a cached prediction stays valid
+            cache_gsr_resolution: GSR quantization step for cache keys (0 = exact)
+            mode: "exact" or "grid". Grid mode answers from rf_glucose_model.grid.npz
+                (built by grid_lookup.py) and never loads the forests.
+            grid_interpolation: "nearest" or "linear" lookup in grid mode
         """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}'. Expected one of {BACKENDS}")
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode '{mode}'. Expected one of {MODES}")
+        
         if model_path is None:
             # Default to current directory
             model_path = os.path.join(os.path.dirname(__file__), "rf_glucose_model.pkl")
         
+        stem = os.path.splitext(model_path)[0]
+        if model_path.endswith(ARTIFACT_EXTENSION):
+            model_path = stem + ".pkl"
+        
         self.model_path = model_path
+        self.artifact_path = stem + ARTIFACT_EXTENSION
+        self.grid_path = stem + GRID_EXTENSION
+        self.backend = backend
+        self.mode = mode
+        self.grid_interpolation = grid_interpolation
+        self.grid = None
         self.regressor = None
         self.classifier = None
+        self.compiled_regressor = None
+        self.compiled_classifier = None
         self.is_loaded = False
+        self.cache = None
+        if cache_size > 0:
+            self.cache = PredictionCache(cache_size, cache_ttl, cache_gsr_resolution)
+        self._loaded_signature = ()
+        self._last_model_check = time.monotonic()
+        self._reload_lock = threading.Lock()
         
         self.load_models()
     
     def load_models(self):
-        """Load trained models from pickle file"""
+        """
+        Load trained models, replacing any previously loaded ones
+        
+        The compiled and auto backends memory-map the binary artifact when it
+        exists, so worker processes share its pages and skip unpickling. The
+        auto backend defers the pickle (and the sklearn import) until a batch
+        larger than AUTO_COMPILED_MAX_ROWS needs it. If the artifact is
+        missing or unreadable, the tables are compiled from the pickle instead.
+        """
+        # Read before loading so a file replaced mid-load triggers another reload
+        signature = self._model_signature()
+        
+        if self.mode == "grid":
+            self._load_grid(signature)
+            return
+        regressor = classifier = compiled_regressor = compiled_classifier = None
+        
+        if self.backend != "sklearn" and os.path.exists(self.artifact_path):
+            try:
+                models, header = load_artifact(self.artifact_path)
+                compiled_regressor = models["regressor"]
+                compiled_classifier = models["classifier"]
+                print(f"✅ Models memory-mapped from {self.artifact_path} "
+                      f"(format v{header['format_version']})")
+            except Exception as e:
+                print(f"⚠️  Could not load artifact {self.artifact_path}: {str(e)}")
+                print("   Falling back to the pickled models")
+                compiled_regressor = compiled_classifier = None
+        
+        if self.backend == "sklearn" or compiled_regressor is None:
+            models = self._load_pickle()
+            if models is None:
+                # Keep serving the previous models (if any) on a failed reload
+                return
+            regressor, classifier = models
+            if self.backend != "sklearn" and compiled_regressor is None:
+                compiled_regressor = CompiledForest.from_sklearn(regressor)
+                compiled_classifier = CompiledForest.from_sklearn(classifier)
+        
+        was_loaded = self.is_loaded
+        self.regressor, self.classifier = regressor, classifier
+        self.compiled_regressor, self.compiled_classifier = compiled_regressor, compiled_classifier
+        self._loaded_signature = signature
+        self.is_loaded = True
+        if was_loaded and self.cache is not None:
+            self.cache.clear()
+    
+    def _load_pickle(self):
+        """Unpickle the sklearn (regressor, classifier) pair; None if missing or unreadable"""
         if not os.path.exists(self.model_path):
             print(f"⚠️  Model file not found at {self.model_path}")
             print("   Run train_model.py first to train and save models")
-            return
+            return None
         
         try:
             with open(self.model_path, "rb") as f:
-                self.regressor, self.classifier = pickle.load(f)
-            self.is_loaded = True
+                regressor, classifier = pickle.load(f)
+            # Forests are pickled with the training-time verbose=1, which
+            # prints joblib progress on every predict call
+            for model in (regressor, classifier):
+                model.set_params(verbose=0)
             print(f"✅ Models loaded successfully from {self.model_path}")
+            return regressor, classifier
         except Exception as e:
             print(f"❌ Error loading models: {str(e)}")
-            self.is_loaded = False
+            return None
+    
+    def _sklearn_models(self):
+        """The sklearn forests, unpickled on first use when they were deferred (auto backend)"""
+        if self.regressor is None:
+            with self._reload_lock:
+                if self.regressor is None:
+                    models = self._load_pickle()
+                    if models is None:
+                        raise Exception("Models not loaded. Check model_path.")
+                    self.regressor, self.classifier = models
+        return self.regressor, self.classifier
+    
+    def _load_grid(self, signature: Tuple):
+        """Load the precomputed lookup grid (grid mode)"""
+        if not os.path.exists(self.grid_path):
+            print(f"⚠️  Lookup grid not found at {self.grid_path}")
+            print("   Run grid_lookup.py first to build it")
+            return
+        
+        try:
+            grid = GridLookup.load(self.grid_path, interpolation=self.grid_interpolation)
+            print(f"✅ Lookup grid loaded from {self.grid_path} "
+                  f"(shape {tuple(int(n) for n in grid.shape)}, {self.grid_interpolation})")
+        except Exception as e:
+            print(f"❌ Error loading lookup grid: {str(e)}")
+            return
+        
+        was_loaded = self.is_loaded
+        self.grid = grid
+        self._loaded_signature = signature
+        self.is_loaded = True
+        if was_loaded and self.cache is not None:
+            self.cache.clear()
+    
+    def _model_signature(self) -> Tuple:
+        """(path, mtime, size) of each model file that exists"""
+        signature = []
+        paths = (self.grid_path,) if self.mode == "grid" else (self.model_path, self.artifact_path)
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+    
+    def check_for_model_update(self) -> bool:
+        """
+        Reload the models if the pickle or artifact changed on disk
+        
+        Checks at most once every MODEL_CHECK_INTERVAL seconds. A reload also
+        clears the prediction cache.
+        
+        Returns:
+            True if the models were reloaded
+        """
+        now = time.monotonic()
+        if now - self._last_model_check < MODEL_CHECK_INTERVAL:
+            return False
+        with self._reload_lock:
+            if now - self._last_model_check < MODEL_CHECK_INTERVAL:
+                return False
+            self._last_model_check = now
+            if self._model_signature() == self._loaded_signature:
+                return False
+            print("🔄 Model files changed on disk, reloading...")
+            self.load_models()
+            return True
+    
+    def lookup_cached(self, heart_rate: float, spo2: float, gsr: float):
+        """Return a cached predict_full result for these inputs, or None"""
+        if self.cache is None:
+            return None
+        self.check_for_model_update()
+        hit = self.cache.get(heart_rate, spo2, gsr)
+        if hit is None:
+            return None
+        return self.format_result(*hit, heart_rate, spo2, gsr)
+    
+    def store_cached(self, heart_rate: float, spo2: float, gsr: float,
+                     glucose, status, confidence, generation: int = None):
+        """Add one prediction to the cache (no-op when caching is disabled)"""
+        if self.cache is not None:
+            self.cache.put(
+                heart_rate, spo2, gsr,
+                (float(glucose), str(status), float(confidence)),
+                generation=generation
+            )
+    
+    def _select_models(self, n_rows: int):
+        """Return the (regressor, classifier) pair to use for a batch of n_rows"""
+        if self.mode == "grid":
+            return self.grid.regressor, self.grid.classifier
+        if self.backend == "compiled" or (
+                self.backend == "auto" and n_rows <= AUTO_COMPILED_MAX_ROWS):
+            return self.compiled_regressor, self.compiled_classifier
+        return self._sklearn_models()
     
     def predict_glucose(self, heart_rate: float, spo2: float, gsr: float) -> float:
         """
@@ -64,7 +274,8 @@ class GlucosePredictor:
         features = np.array([[heart_rate, spo2, gsr]])
         
         # Predict
-        glucose_prediction = self.regressor.predict(features)[0]
+        regressor, _ = self._select_models(1)
+        glucose_prediction = regressor.predict(features)[0]
         
         return float(glucose_prediction)
     
@@ -89,10 +300,11 @@ class GlucosePredictor:
         features = np.array([[heart_rate, spo2, gsr]])
         
         # Predict class
-        status = self.classifier.predict(features)[0]
+        _, classifier = self._select_models(1)
+        status = classifier.predict(features)[0]
         
         # Get prediction probability
-        probabilities = self.classifier.predict_proba(features)[0]
+        probabilities = classifier.predict_proba(features)[0]
         confidence = float(np.max(probabilities))
         
         return str(status), confidence
@@ -112,14 +324,74 @@ class GlucosePredictor:
         if not self.is_loaded:
             raise Exception("Models not loaded. Check model_path.")
         
-        glucose = self.predict_glucose(heart_rate, spo2, gsr)
-        status, confidence = self.predict_diabetes_status(heart_rate, spo2, gsr)
+        cached = self.lookup_cached(heart_rate, spo2, gsr)
+        if cached is not None:
+            return cached
+        
+        generation = self.cache.generation if self.cache is not None else None
+        features = np.array([[heart_rate, spo2, gsr]], dtype=np.float64)
+        glucose, status, confidence = self.predict_arrays(features)
+        self.store_cached(heart_rate, spo2, gsr, glucose[0], status[0], confidence[0], generation)
+        
+        return self.format_result(
+            glucose[0], status[0], confidence[0], heart_rate, spo2, gsr
+        )
+    
+    def predict_arrays(self, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Run both forests once over a whole feature matrix
+        
+        Args:
+            features: Float array of shape (N, 3) in HeartRate, SpO2, GSR order
+        
+        Returns:
+            Tuple of (glucose, status, confidence) arrays of length N
+            The status is the argmax of a single predict_proba call, which is
+            exactly what classifier.predict would return.
+        """
+        glucose, probabilities, classes = self.predict_outputs(features)
+        best = np.argmax(probabilities, axis=1)
+        status = classes.take(best)
+        confidence = probabilities[np.arange(len(best)), best]
+        
+        return glucose, status, confidence
+    
+    def predict_outputs(self, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Raw model outputs for a feature matrix
+        
+        Args:
+            features: Float array of shape (N, 3) in HeartRate, SpO2, GSR order
         
+        Returns:
+            Tuple of (glucose, class probabilities of shape (N, n_classes), classes)
+        """
+        if not self.is_loaded:
+            raise Exception("Models not loaded. Check model_path.")
+        
+        self.check_for_model_update()
+        regressor, classifier = self._select_models(len(features))
+        return regressor.predict(features), classifier.predict_proba(features), classifier.classes_
+    
+    @property
+    def classes(self) -> np.ndarray:
+        """Status labels in the column order of predict_outputs probabilities"""
+        return self._select_models(1)[1].classes_
+    
+    def exact_models(self) -> Tuple:
+        """The loaded (regressor, classifier) forests, compiled tables preferred"""
+        if self.compiled_regressor is not None:
+            return self.compiled_regressor, self.compiled_classifier
+        return self.regressor, self.classifier
+    
+    @staticmethod
+    def format_result(glucose, status, confidence, heart_rate, spo2, gsr) -> Dict:
+        """Build the per-sample result dict shared by single and batch predictions"""
         return {
-            "glucose_prediction": round(glucose, 2),
+            "glucose_prediction": round(float(glucose), 2),
             "glucose_unit": "mg/dL",
-            "diabetes_status": status,
-            "status_confidence": round(confidence, 4),
+            "diabetes_status": str(status),
+            "status_confidence": round(float(confidence), 4),
             "input": {
                 "heart_rate": heart_rate,
                 "spo2": spo2,
@@ -135,16 +407,47 @@ class GlucosePredictor:
             data_list: List of dicts with keys: heart_rate, spo2, gsr
         
         Returns:
-            List of prediction results
-        """
-        results = []
-        for data in data_list:
-            result = self.predict_full(
-                data["heart_rate"],
-                data["spo2"],
-                data["gsr"]
-            )
-            results.append(result)
+            List of prediction results, in input order. Rows with missing or
+            non-numeric values get an {"error", "input"} entry instead.
+        """
+        if not self.is_loaded:
+            raise Exception("Models not loaded. Check model_path.")
+        
+        # Parse every row into one (N, 3) matrix; rows that fail validation
+        # are reported individually and left out of the forest evaluation
+        features = np.empty((len(data_list), len(FEATURE_KEYS)), dtype=np.float64)
+        results: List[Dict] = [None] * len(data_list)
+        valid_rows = []
+        
+        for i, data in enumerate(data_list):
+            try:
+                row = [float(data[key]) for key in FEATURE_KEYS]
+            except KeyError as e:
+                results[i] = {"error": f"Missing required field: {e.args[0]}", "input": data}
+                continue
+            except (ValueError, TypeError):
+                results[i] = {"error": "Invalid input values. Expected numbers.", "input": data}
+                continue
+            
+            if not np.all(np.isfinite(row)):
+                results[i] = {"error": "Invalid input values. Expected finite numbers.", "input": data}
+                continue
+            
+            features[len(valid_rows)] = row
+            valid_rows.append(i)
+        
+        if valid_rows:
+            valid_features = features[:len(valid_rows)]
+            glucose, status, confidence = self.predict_arrays(valid_features)
+            
+            for j, i in enumerate(valid_rows):
+                # Echo the caller's values, as predict_full does; the float
+                # matrix is only used for evaluation
+                heart_rate, spo2, gsr = (data_list[i][key] for key in FEATURE_KEYS)
+                results[i] = self.format_result(
+                    glucose[j], status[j], confidence[j], heart_rate, spo2, gsr
+                )
+        
         return results
 
 
@@ -11,11 +11,13 @@ import pickle
 import os
 import numpy as np
 from datetime import datetime
+from compiled_forest import CompiledForest, save_artifact
 
 # Configure paths
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DATASET_PATH = os.path.join(SCRIPT_DIR, "glucose_dataset.csv")
 MODEL_PATH = os.path.join(SCRIPT_DIR, "rf_glucose_model.pkl")
+ARTIFACT_PATH = os.path.join(SCRIPT_DIR, "rf_glucose_model.forest")
 METRICS_PATH = os.path.join(SCRIPT_DIR, "model_metrics.txt")
 
 print("=" * 70)
@@ -222,6 +224,19 @@ except Exception as e:
     print(f"   ❌ ERROR saving models: {str(e)}")
     exit(1)
 
+# Pickle-free binary artifact: flat node tables that the predictor memory-maps
+try:
+    header = save_artifact(ARTIFACT_PATH, {
+        "regressor": CompiledForest.from_sklearn(regressor),
+        "classifier": CompiledForest.from_sklearn(classifier),
+    })
+    print(f"   ✅ Binary artifact saved (format v{header['format_version']})")
+    print(f"   📁 Artifact file: {ARTIFACT_PATH}")
+    print(f"   📦 File size: {os.path.getsize(ARTIFACT_PATH) / 1024:.2f} KB")
+except Exception as e:
+    print(f"   ❌ ERROR saving binary artifact: {str(e)}")
+    exit(1)
+
 print()
 
 # ============================================================================
@@ -284,6 +299,8 @@ MODEL FILES
 {'=' * 70}
 Location: {MODEL_PATH}
 File Size: {os.path.getsize(MODEL_PATH) / 1024:.2f} KB
+Binary Artifact: {ARTIFACT_PATH}
+Artifact Size: {os.path.getsize(ARTIFACT_PATH) / 1024:.2f} KB
 """
 
 try:
@@ -311,6 +328,7 @@ print(f"   Classification Accuracy (Test): {test_accuracy*100:.2f}%")
 print()
 print("📁 Saved Files:")
 print(f"   • {MODEL_PATH}")
+print(f"   • {ARTIFACT_PATH}")
 print(f"   • {METRICS_PATH}")
 print()
 print("🚀 Next Steps:")
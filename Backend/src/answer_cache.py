@@ -0,0 +1,153 @@
+"""
+Semantic Answer Cache
+Reuses the answer to an earlier first-turn question when a new one is a close paraphrase with the same sources
+"""
+
+import threading
+import time
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """
+    Thread-safe cache of (question embedding, retrieved chunk IDs, answer)
+
+    get() returns a stored answer when the new question's embedding has at
+    least `threshold` cosine similarity with a stored one and the retriever
+    returned the same chunk IDs, so a paraphrase is only answered from the
+    cache if the LLM would have been shown the same context. Only first-turn
+    questions may be stored or looked up: with chat history the answer also
+    depends on the conversation.
+
+    Embeddings live in one preallocated matrix, so a lookup is a single
+    matrix-vector product over all entries.
+    """
+
+    def __init__(self, threshold=0.95, maxsize=1000, ttl=86400.0):
+        """
+        Args:
+            threshold: Minimum cosine similarity for a hit
+            maxsize: Maximum number of entries before the least recently used is evicted
+            ttl: Seconds an entry stays valid (0 or less disables expiry)
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be >= 1")
+        if not -1.0 <= threshold <= 1.0:
+            raise ValueError("threshold must be between -1 and 1")
+
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        # Row i of _vectors belongs to _entries[i]; None marks a free slot
+        self._vectors = None
+        self._entries = [None] * maxsize
+        self._last_used = np.zeros(maxsize)
+
+        self.hits = 0
+        self.misses = 0
+        # Similar enough, but the retriever returned different chunks
+        self.source_mismatches = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def get(self, embedding, chunk_ids):
+        """
+        Return the stored {'answer', 'sources', 'similarity'} for a paraphrase, or None
+
+        Args:
+            embedding: Embedding of the new question
+            chunk_ids: IDs of the chunks retrieved for it
+        """
+        chunk_ids = tuple(chunk_ids)
+        query = self._unit(embedding)
+        now = time.monotonic()
+        with self._lock:
+            if self._vectors is None:
+                self.misses += 1
+                return None
+            similarities = self._vectors @ query
+            candidates = np.flatnonzero(similarities >= self.threshold)
+            mismatch = False
+            for slot in candidates[np.argsort(-similarities[candidates])]:
+                entry = self._entries[slot]
+                if entry is None:
+                    continue
+                if entry['expires_at'] is not None and now >= entry['expires_at']:
+                    self._free(slot)
+                    self.expirations += 1
+                    continue
+                if entry['chunk_ids'] != chunk_ids:
+                    mismatch = True
+                    continue
+                self._last_used[slot] = now
+                self.hits += 1
+                return {
+                    'answer': entry['answer'],
+                    'sources': entry['sources'],
+                    'similarity': round(float(similarities[slot]), 4),
+                }
+            self.misses += 1
+            self.source_mismatches += mismatch
+            return None
+
+    def put(self, embedding, chunk_ids, answer, sources=None):
+        """Store the answer to a first-turn question"""
+        vector = self._unit(embedding)
+        now = time.monotonic()
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.maxsize, vector.shape[0]), dtype=np.float32)
+            free = [i for i, entry in enumerate(self._entries) if entry is None]
+            if free:
+                slot = free[0]
+            else:
+                slot = int(np.argmin(self._last_used))
+                self._free(slot)
+                self.evictions += 1
+            self._vectors[slot] = vector
+            self._entries[slot] = {
+                'chunk_ids': tuple(chunk_ids),
+                'answer': answer,
+                'sources': sources or [],
+                'expires_at': now + self.ttl if self.ttl > 0 else None,
+            }
+            self._last_used[slot] = now
+
+    def _free(self, slot):
+        # Zero rows never reach a positive threshold
+        self._entries[slot] = None
+        self._vectors[slot] = 0.0
+        self._last_used[slot] = 0.0
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries = [None] * self.maxsize
+            self._vectors = None
+            self._last_used[:] = 0.0
+
+    def stats(self):
+        """Hit/miss/eviction counters and current occupancy"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': sum(entry is not None for entry in self._entries),
+                'maxsize': self.maxsize,
+                'threshold': self.threshold,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'source_mismatches': self.source_mismatches,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
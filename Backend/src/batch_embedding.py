@@ -0,0 +1,79 @@
+"""
+Batch Embedding
+Encodes corpus chunks in large encode calls, optionally split across threads, and measures encoder throughput
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.embeddings import Embeddings
+
+
+class BatchEmbeddings(Embeddings):
+    """
+    Embeddings wrapper for corpus builds
+
+    embed_documents() passes all texts to the wrapped model in one call;
+    sentence-transformers sorts them by length and pads each batch of
+    encode_kwargs['batch_size'] only to its own longest text. With threads > 1
+    the texts are split into one contiguous shard per thread and the shards
+    are encoded concurrently (each sorted the same way). Vectors are returned
+    in the original order. Query embeddings pass straight through.
+    """
+
+    def __init__(self, embeddings, batch_size=64, threads=1):
+        """
+        Args:
+            embeddings: Wrapped Embeddings (e.g. HuggingFaceEmbeddings)
+            batch_size: Texts per model batch, as configured on the wrapped model (reported in stats)
+            threads: Shards encoded concurrently
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be >= 1")
+        if threads < 1:
+            raise ValueError("threads must be >= 1")
+
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.threads = threads
+
+        self._lock = threading.Lock()
+        self.chunks = 0
+        self.seconds = 0.0
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        started = time.perf_counter()
+
+        texts = list(texts)
+        # Shards smaller than a batch would only add encode calls
+        shards = min(self.threads, -(-len(texts) // self.batch_size))
+        if shards > 1:
+            size = -(-len(texts) // shards)
+            parts = [texts[start:start + size] for start in range(0, len(texts), size)]
+            with ThreadPoolExecutor(max_workers=len(parts)) as executor:
+                vectors = [vector for part in executor.map(self.embeddings.embed_documents, parts)
+                           for vector in part]
+        else:
+            vectors = self.embeddings.embed_documents(texts)
+
+        with self._lock:
+            self.chunks += len(texts)
+            self.seconds += time.perf_counter() - started
+        return vectors
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+    def stats(self):
+        """Chunks encoded by this process and the resulting throughput"""
+        with self._lock:
+            return {
+                'batch_size': self.batch_size,
+                'threads': self.threads,
+                'chunks': self.chunks,
+                'seconds': round(self.seconds, 3),
+                'chunks_per_s': round(self.chunks / self.seconds, 1) if self.seconds > 0 else 0.0,
+            }
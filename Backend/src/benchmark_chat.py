@@ -0,0 +1,187 @@
+"""
+Chat Pipeline Benchmark
+Runs a fixed question set through retrieval and the QA chain with a local fake LLM and reports per-stage latency
+Run: python benchmark_chat.py [--repeat 5] [--llm-latency 0.3] [--output chat_benchmark.json] [--baseline old.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+import main as rag
+from fake_llm import FakeStreamingChatModel
+from retrieval_cache import CachedRetriever
+
+QUESTIONS = [
+    "What is HbA1c?",
+    "What is a normal fasting blood sugar level?",
+    "What are the early symptoms of type 2 diabetes?",
+    "How does metformin work?",
+    "What is the difference between type 1 and type 2 diabetes?",
+    "How often should I check my blood glucose?",
+    "What foods should people with diabetes avoid?",
+    "What causes diabetic ketoacidosis?",
+    "How does exercise affect blood sugar?",
+    "What are the long-term complications of diabetes?",
+    "Can type 2 diabetes be reversed?",
+    "What is insulin resistance?",
+]
+
+STAGES = ('embed', 'search', 'prompt_build', 'generate_first_token', 'generate', 'chain_total')
+
+
+def staged_retriever(vector_db, keep_caches):
+    """The configured retriever, split into separately timed embed and search steps"""
+    retriever = rag.get_retriever(vector_db)
+    if isinstance(retriever, CachedRetriever):
+        if keep_caches:
+            return retriever
+        return retriever.model_copy(update={'embedding_cache': None, 'results_cache': None})
+    # Plain Chroma or local-index retriever without caches
+    return CachedRetriever(
+        vector_db=vector_db,
+        k=rag.RETRIEVAL_K,
+        local_index=getattr(retriever, 'index', None),
+        nprobe=getattr(retriever, 'nprobe', 0)
+    )
+
+
+def run_question(question, retriever, compressor, llm, qa_chain):
+    """Seconds spent in each stage for one question"""
+    timings = {}
+
+    start = time.perf_counter()
+    vector = retriever.embed_question(question)
+    timings['embed'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    docs = retriever.fetch(retriever.search(question, vector))
+    timings['search'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    docs = compressor.compress_documents(docs, question)
+    prompt = rag.QA_PROMPT.format(
+        context="\n\n".join(doc.page_content for doc in docs),
+        chat_history=rag.format_chat_history([]),
+        question=question
+    )
+    timings['prompt_build'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    first = None
+    for chunk in llm.stream(prompt):
+        if first is None:
+            first = time.perf_counter() - start
+    timings['generate_first_token'] = first or 0.0
+    timings['generate'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    qa_chain.invoke({"question": question, "chat_history": []})
+    timings['chain_total'] = time.perf_counter() - start
+    return timings
+
+
+def summarize(samples):
+    """p50/p95/p99/mean in milliseconds"""
+    values = np.array(samples) * 1000
+    return {
+        'n': len(values),
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p95_ms': round(float(np.percentile(values, 95)), 3),
+        'p99_ms': round(float(np.percentile(values, 99)), 3),
+        'mean_ms': round(float(values.mean()), 3),
+    }
+
+
+def compare(results, baseline_path, tolerance):
+    """Stages whose p95 grew by more than tolerance relative to a previous results file"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = []
+    for stage, summary in results['stages'].items():
+        before = baseline.get('stages', {}).get(stage)
+        if before and before['p95_ms'] > 0 and summary['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append((stage, before['p95_ms'], summary['p95_ms']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the RAG chat path with a fake LLM")
+    parser.add_argument("--repeat", type=int, default=5, help="Passes over the question set")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Fake LLM seconds to first token")
+    parser.add_argument("--llm-tokens-per-s", type=float, default=200.0)
+    parser.add_argument("--cached", action="store_true", help="Keep the query caches (default: every query cold)")
+    parser.add_argument("--output", default="chat_benchmark.json")
+    parser.add_argument("--baseline", help="Earlier results file to compare p95 latencies against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 growth before failing")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    vector_db = rag.load_vector_db()
+    llm = FakeStreamingChatModel(first_token_latency=args.llm_latency, tokens_per_s=args.llm_tokens_per_s)
+    retriever = staged_retriever(vector_db, args.cached)
+    qa_chain = rag.setup_qa_chain(vector_db, llm, retriever, use_memory=False)
+    # The chain's retriever wraps ours in the context-budget compressor
+    compressor = qa_chain.retriever.base_compressor
+
+    run_question(QUESTIONS[0], retriever, compressor, llm, qa_chain)  # warm-up
+
+    samples = {stage: [] for stage in STAGES}
+    for _ in range(args.repeat):
+        for question in QUESTIONS:
+            for stage, seconds in run_question(question, retriever, compressor, llm, qa_chain).items():
+                samples[stage].append(seconds)
+
+    results = {
+        'timestamp': datetime.now().isoformat(),
+        'config': {
+            'questions': len(QUESTIONS),
+            'repeat': args.repeat,
+            'cached': args.cached,
+            'fake_llm_latency_s': args.llm_latency,
+            'fake_llm_tokens_per_s': args.llm_tokens_per_s,
+            'retriever_backend': rag.RETRIEVER_BACKEND,
+            'retrieval_mode': rag.RETRIEVAL_MODE,
+            'context_compression': rag.CONTEXT_COMPRESSION,
+            'k': rag.RETRIEVAL_K,
+            'chunks': len(vector_db.get(include=[])['ids']),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+        },
+        'stages': {stage: summarize(values) for stage, values in samples.items()},
+    }
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print("=" * 70)
+    print(f"⏱️  CHAT PIPELINE BENCHMARK ({len(QUESTIONS)} questions x {args.repeat})")
+    print("=" * 70)
+    print(f"{'Stage':<22} {'p50 (ms)':>11} {'p95 (ms)':>11} {'p99 (ms)':>11} {'mean (ms)':>11}")
+    print("-" * 70)
+    for stage, summary in results['stages'].items():
+        print(f"{stage:<22} {summary['p50_ms']:>11.2f} {summary['p95_ms']:>11.2f} "
+              f"{summary['p99_ms']:>11.2f} {summary['mean_ms']:>11.2f}")
+    print("-" * 70)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        for stage, before, after in regressions:
+            print(f"❌ {stage}: p95 {before:.2f} ms -> {after:.2f} ms (> {args.tolerance:.0%} slower)")
+        if regressions:
+            sys.exit(1)
+        print(f"✅ No stage regressed by more than {args.tolerance:.0%} against {args.baseline}")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Retrieval Benchmark
+Compares top-k latency and recall of Chroma against the local NumPy index (exact float32/float16 and IVF)
+Run: python benchmark_retrieval.py [--k 3] [--queries 500] [--ivf-lists 64] [--nprobe 1 4 16]
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from local_index import LocalVectorIndex, source_version
+from main import load_vector_db
+
+# Questions embedded with the real model; the rest of the query set is
+# perturbed chunk embeddings, so no model call is needed per query
+QUESTIONS = [
+    "What is HbA1c?",
+    "What is a normal fasting blood sugar level?",
+    "What are the early symptoms of type 2 diabetes?",
+    "How does metformin work?",
+    "What is the difference between type 1 and type 2 diabetes?",
+    "How often should I check my blood glucose?",
+    "What foods should people with diabetes avoid?",
+    "What causes diabetic ketoacidosis?",
+    "How does exercise affect blood sugar?",
+    "What are the long-term complications of diabetes?",
+]
+
+
+def make_queries(embeddings, vectors, n, seed=42):
+    """Question embeddings plus noisy copies of random chunk vectors, normalized"""
+    rng = np.random.default_rng(seed)
+    queries = [np.asarray(embeddings.embed_query(q), dtype=np.float32) for q in QUESTIONS]
+    if n > len(queries):
+        rows = rng.choice(len(vectors), n - len(queries))
+        noisy = vectors[rows] + rng.normal(0, 0.05, (len(rows), vectors.shape[1])).astype(np.float32)
+        queries.extend(noisy)
+    queries = np.stack(queries[:n])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def time_search(search, queries):
+    """Per-query latencies in milliseconds and the returned ID lists"""
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        ids = search(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(ids)
+    return np.array(latencies), results
+
+
+def recall(results, truth):
+    """Mean fraction of the exact top-k found"""
+    return float(np.mean([len(set(r) & set(t)) / len(t) for r, t in zip(results, truth) if t]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Chroma against the local vector index")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--ivf-lists", type=int, default=64)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    vector_db = load_vector_db()
+    data = vector_db.get(include=['embeddings', 'documents', 'metadatas'])
+    vectors = np.asarray(data['embeddings'], dtype=np.float32)
+    if not len(vectors):
+        print("❌ Vector database is empty. Add PDFs to Data/ first.")
+        exit(1)
+    queries = make_queries(vector_db.embeddings, vectors, args.queries)
+    version = source_version(data['ids'])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def build(name, dtype, ivf_lists=0):
+            start = time.perf_counter()
+            index = LocalVectorIndex.build(
+                f"{tmp}/{name}", data['ids'], vectors, data['documents'], data['metadatas'],
+                dtype=dtype, ivf_lists=ivf_lists, source_version=version
+            )
+            return index, time.perf_counter() - start
+
+        exact32, build32 = build('exact32', 'float32')
+        exact16, build16 = build('exact16', 'float16')
+        ivf, build_ivf = build('ivf', 'float32', args.ivf_lists)
+
+        backends = [
+            ("Chroma", lambda q: vector_db._collection.query(
+                query_embeddings=[q.tolist()], n_results=args.k, include=[])['ids'][0], None),
+            ("Local exact f32", lambda q: exact32.search(q, args.k)[0], build32),
+            ("Local exact f16", lambda q: exact16.search(q, args.k)[0], build16),
+        ]
+        for nprobe in args.nprobe:
+            backends.append((f"IVF{ivf.info['ivf_lists']} nprobe={nprobe}",
+                             lambda q, nprobe=nprobe: ivf.search(q, args.k, nprobe)[0], build_ivf))
+
+        _, truth = time_search(lambda q: exact32.search(q, args.k)[0], queries)
+
+        print("=" * 78)
+        print(f"⏱️  RETRIEVAL BENCHMARK ({len(vectors)} chunks, {len(queries)} queries, k={args.k})")
+        print("=" * 78)
+        print(f"{'Backend':<22} {'p50 (ms)':>10} {'p95 (ms)':>10} {'QPS':>10} {'Recall@k':>10} {'Build (s)':>10}")
+        print("-" * 78)
+        for name, search, build_s in backends:
+            search(queries[0])  # warm-up
+            latencies, results = time_search(search, queries)
+            build_col = f"{build_s:>10.2f}" if build_s is not None else f"{'-':>10}"
+            print(f"{name:<22} {np.percentile(latencies, 50):>10.3f} {np.percentile(latencies, 95):>10.3f} "
+                  f"{1000 / latencies.mean():>10.0f} {recall(results, truth):>10.3f} {build_col}")
+        print("-" * 78)
+        print("Recall is measured against exact float32 search over the same vectors")
+        print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
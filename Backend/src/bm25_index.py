@@ -0,0 +1,172 @@
+"""
+BM25 Inverted Index
+On-disk (SQLite) lexical index over the same chunks as the vector store, updated incrementally by ingestion
+"""
+
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+
+INDEX_NAME = "bm25_index.sqlite3"
+
+# Standard BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Reciprocal rank fusion constant (Cormack et al. use 60)
+RRF_K = 60
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i in is it its my of on or "
+    "should that the their there these this to was what when which who why will with you your".split()
+)
+
+
+def tokenize(text):
+    """Lower-case alphanumeric terms, so 'HbA1c' and 'Metformin' match exactly"""
+    return [term for term in re.findall(r'[a-z0-9]+', text.lower()) if term not in STOPWORDS]
+
+
+def reciprocal_rank_fusion(rankings, k, rrf_k=RRF_K):
+    """
+    Fuse ranked ID lists by summing 1 / (rrf_k + rank)
+
+    Returns:
+        Top k IDs, best first; ties keep the order of the first ranking
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores, key=lambda chunk_id: -scores[chunk_id])[:k]
+
+
+class BM25Index:
+    """
+    Inverted index with BM25 scoring, stored in SQLite
+
+    Postings (term, chunk ID, term frequency), document lengths and document
+    frequencies are kept on disk and updated chunk by chunk, so adding or
+    removing a PDF only touches that PDF's chunks. A query reads only the
+    posting lists of its own terms.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: SQLite database file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS docs (chunk_id TEXT PRIMARY KEY, length INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, df INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS postings ("
+            " term TEXT NOT NULL, chunk_id TEXT NOT NULL, tf INTEGER NOT NULL,"
+            " PRIMARY KEY (term, chunk_id)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS postings_chunk ON postings (chunk_id);"
+        )
+        self._conn.commit()
+        # (document count, average length), recomputed after writes
+        self._stats = None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def ids(self):
+        """Every indexed chunk ID"""
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT chunk_id FROM docs")}
+
+    def add(self, ids, texts):
+        """Index chunks; re-adding an ID replaces its previous text"""
+        with self._lock:
+            self._delete(ids)
+            postings = []
+            df = Counter()
+            docs = []
+            for chunk_id, text in zip(ids, texts):
+                counts = Counter(tokenize(text))
+                docs.append((chunk_id, sum(counts.values())))
+                postings.extend((term, chunk_id, tf) for term, tf in counts.items())
+                df.update(counts.keys())
+            self._conn.executemany("INSERT INTO docs VALUES (?, ?)", docs)
+            self._conn.executemany("INSERT INTO postings VALUES (?, ?, ?)", postings)
+            self._conn.executemany(
+                "INSERT INTO terms VALUES (?, ?) ON CONFLICT (term) DO UPDATE SET df = df + excluded.df",
+                df.items()
+            )
+            self._conn.commit()
+            self._stats = None
+
+    def delete(self, ids):
+        """Remove chunks from the index"""
+        with self._lock:
+            self._delete(ids)
+            self._conn.commit()
+            self._stats = None
+
+    def _delete(self, ids):
+        ids = list(ids)
+        for start in range(0, len(ids), 500):
+            part = ids[start:start + 500]
+            marks = ','.join('?' * len(part))
+            df = Counter(row[0] for row in self._conn.execute(
+                f"SELECT term FROM postings WHERE chunk_id IN ({marks})", part
+            ))
+            self._conn.executemany("UPDATE terms SET df = df - ? WHERE term = ?",
+                                   [(n, term) for term, n in df.items()])
+            self._conn.execute(f"DELETE FROM postings WHERE chunk_id IN ({marks})", part)
+            self._conn.execute(f"DELETE FROM docs WHERE chunk_id IN ({marks})", part)
+        self._conn.execute("DELETE FROM terms WHERE df <= 0")
+
+    def clear(self):
+        """Drop every chunk"""
+        with self._lock:
+            self._conn.executescript("DELETE FROM postings; DELETE FROM terms; DELETE FROM docs;")
+            self._conn.commit()
+            self._stats = None
+
+    def search(self, query, k=20):
+        """
+        Top-k chunks by BM25 score
+
+        Returns:
+            List of (chunk ID, score), best first
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        with self._lock:
+            if self._stats is None:
+                count, avg_length = self._conn.execute("SELECT COUNT(*), AVG(length) FROM docs").fetchone()
+                self._stats = (count, avg_length or 1.0)
+            count, avg_length = self._stats
+            scores = Counter()
+            for term in terms:
+                row = self._conn.execute("SELECT df FROM terms WHERE term = ?", (term,)).fetchone()
+                if row is None:
+                    continue
+                idf = math.log(1 + (count - row[0] + 0.5) / (row[0] + 0.5))
+                for chunk_id, tf, length in self._conn.execute(
+                    "SELECT p.chunk_id, p.tf, d.length FROM postings p JOIN docs d USING (chunk_id)"
+                    " WHERE p.term = ?", (term,)
+                ):
+                    norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                    scores[chunk_id] += idf * tf * (BM25_K1 + 1) / norm
+        return scores.most_common(k)
+
+    def sync_with(self, vector_db):
+        """Rebuild from the vector store if the two hold different chunks (e.g. first use)"""
+        stored = vector_db.get(include=[])['ids']
+        if set(stored) == self.ids():
+            return False
+        data = vector_db.get(include=['documents'])
+        self.clear()
+        self.add(data['ids'], data['documents'])
+        return True
@@ -0,0 +1,180 @@
+"""
+Context Budget
+Compresses retrieved chunks before generation: trims chunk overlap, drops low-relevance sentences, caps context tokens
+"""
+
+import math
+import re
+import threading
+from typing import Any, Callable, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.documents.compressor import BaseDocumentCompressor
+
+# Shortest shared text treated as splitter overlap rather than coincidence
+MIN_OVERLAP_CHARS = 20
+MAX_OVERLAP_CHARS = 200
+
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+|\n+')
+
+
+def estimate_tokens(text):
+    """Approximate LLM token count (about 4 characters per token for English)"""
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def split_sentences(text):
+    return [sentence.strip() for sentence in SENTENCE_SPLIT.split(text) if sentence.strip()]
+
+
+def trim_overlap(previous, text):
+    """
+    Drop the part of text that repeats previous at a chunk boundary (the splitter's chunk overlap)
+
+    Removes the start of text that repeats the end of previous (text follows
+    previous in the source) and the end of text that repeats the start of
+    previous (text precedes it).
+    """
+    longest = min(len(previous), len(text), MAX_OVERLAP_CHARS)
+    for size in range(longest, MIN_OVERLAP_CHARS - 1, -1):
+        if text.startswith(previous[-size:]):
+            text = text[size:].lstrip()
+            break
+    longest = min(len(previous), len(text), MAX_OVERLAP_CHARS)
+    for size in range(longest, MIN_OVERLAP_CHARS - 1, -1):
+        if previous.startswith(text[-size:]):
+            return text[:-size].rstrip()
+    return text
+
+
+class CompressionStats:
+    """Token counts of the last compression on each thread plus running totals"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.requests = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+
+    def record(self, before, after, sentences_dropped):
+        self._local.last = {
+            'context_tokens_before': before,
+            'context_tokens_after': after,
+            'sentences_dropped': sentences_dropped,
+        }
+        with self._lock:
+            self.requests += 1
+            self.tokens_before += before
+            self.tokens_after += after
+
+    def last(self):
+        """Counts of the most recent compression on the calling thread, or None"""
+        return getattr(self._local, 'last', None)
+
+    def reset_last(self):
+        self._local.last = None
+
+    def summary(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'context_tokens_before': self.tokens_before,
+                'context_tokens_after': self.tokens_after,
+                'reduction': round(1 - self.tokens_after / self.tokens_before, 4) if self.tokens_before else 0.0,
+            }
+
+
+class ContextBudgetCompressor(BaseDocumentCompressor):
+    """
+    Document compressor placed between retrieval and the LLM prompt
+
+    1. Chunk text repeating the start or end of an earlier chunk (the
+       splitter's overlap) or a duplicate chunk is removed.
+    2. Sentences are scored by cosine similarity with the question;
+       sentences below min_relevance are dropped, keeping each chunk's best.
+    3. While the context exceeds token_budget, the lowest-scoring remaining
+       sentences are dropped.
+
+    Kept sentences stay in their original order. With enabled=False the
+    documents pass through unchanged and only token counts are recorded.
+
+    Sentences are embedded with the plain model, not a persistent cache, and
+    sentence_cache (an in-memory LRUCache keyed by sentence text) keeps the
+    vectors of sentences from chunks that are retrieved again.
+    """
+
+    embeddings: Any
+    enabled: bool = True
+    token_budget: int = 300
+    min_relevance: float = 0.2
+    # Optional cached question embedder (e.g. CachedRetriever.embed_question)
+    embed_query: Optional[Callable[[str], Sequence[float]]] = None
+    sentence_cache: Any = None
+    stats: Any = None
+
+    def embed_sentences(self, sentences):
+        """Vectors for sentences, embedding only those missing from sentence_cache"""
+        if self.sentence_cache is None:
+            return np.asarray(self.embeddings.embed_documents(sentences), dtype=np.float32)
+        vectors = [self.sentence_cache.get(sentence) for sentence in sentences]
+        missing = list(dict.fromkeys(s for s, vector in zip(sentences, vectors) if vector is None))
+        if missing:
+            embedded = dict(zip(missing, np.asarray(self.embeddings.embed_documents(missing), dtype=np.float32)))
+            for sentence, vector in embedded.items():
+                self.sentence_cache.put(sentence, vector)
+            vectors = [embedded[s] if vector is None else vector for s, vector in zip(sentences, vectors)]
+        return np.asarray(vectors, dtype=np.float32)
+
+    def compress_documents(self, documents, query, callbacks=None) -> List[Document]:
+        before = sum(estimate_tokens(doc.page_content) for doc in documents)
+        if not self.enabled:
+            if self.stats is not None:
+                self.stats.record(before, before, 0)
+            return list(documents)
+
+        texts, metadatas = [], []
+        for doc in documents:
+            text = doc.page_content
+            for previous in texts:
+                text = trim_overlap(previous, text)
+            if text and text not in texts:
+                texts.append(text)
+                metadatas.append(doc.metadata)
+        sentences = [(i, sentence) for i, text in enumerate(texts) for sentence in split_sentences(text)]
+        if not sentences:
+            if self.stats is not None:
+                self.stats.record(before, 0, 0)
+            return []
+
+        query_vector = np.asarray((self.embed_query or self.embeddings.embed_query)(query), dtype=np.float32)
+        vectors = self.embed_sentences([s for _, s in sentences])
+        norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query_vector) or 1.0)
+        scores = vectors @ query_vector / np.where(norms > 0, norms, 1.0)
+
+        keep = scores >= self.min_relevance
+        for i in range(len(texts)):
+            rows = [row for row, (doc, _) in enumerate(sentences) if doc == i]
+            if rows:
+                keep[max(rows, key=lambda row: scores[row])] = True
+
+        tokens = np.array([estimate_tokens(s) for _, s in sentences])
+        total = int(tokens[keep].sum())
+        for row in np.argsort(scores):
+            if total <= self.token_budget:
+                break
+            if keep[row] and keep.sum() > 1:
+                keep[row] = False
+                total -= int(tokens[row])
+
+        compressed = []
+        for i, metadata in enumerate(metadatas):
+            kept = [s for row, (j, s) in enumerate(sentences) if j == i and keep[row]]
+            if kept:
+                compressed.append(Document(page_content=' '.join(kept), metadata=metadata))
+
+        if self.stats is not None:
+            after = sum(estimate_tokens(doc.page_content) for doc in compressed)
+            self.stats.record(before, after, int(len(sentences) - keep.sum()))
+        return compressed
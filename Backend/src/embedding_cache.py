@@ -0,0 +1,138 @@
+"""
+Persistent Embedding Cache
+Stores chunk embeddings in SQLite keyed by (model, normalize flag, sha256(text)) so rebuilds only embed new text
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def text_sha256(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves document embeddings from an on-disk cache
+
+    embed_documents() looks every text up by its hash, embeds only the misses
+    (each distinct text once) with the wrapped model and stores the results.
+    The cache holds at most max_entries vectors; beyond that the least
+    recently used are evicted. Query embeddings pass straight through.
+    """
+
+    def __init__(self, embeddings, model_name, normalize, cache_path, max_entries=100000):
+        """
+        Args:
+            embeddings: Wrapped Embeddings (e.g. HuggingFaceEmbeddings)
+            model_name: Model identifier, part of the cache key
+            normalize: Whether the model normalizes vectors, part of the cache key
+            cache_path: SQLite database file
+            max_entries: Maximum number of cached vectors
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.normalize = bool(normalize)
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, normalized INTEGER NOT NULL, text_sha256 TEXT NOT NULL,"
+            " vector BLOB NOT NULL, last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, normalized, text_sha256))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def embed_documents(self, texts):
+        hashes = [text_sha256(text) for text in texts]
+        found = self._lookup(set(hashes))
+
+        missing = {}
+        for text, digest in zip(texts, hashes):
+            if digest not in found and digest not in missing:
+                missing[digest] = text
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing, (np.asarray(v, dtype=np.float32) for v in vectors)))
+            self._store(computed)
+            found.update(computed)
+
+        with self._lock:
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+        return [found[digest].tolist() for digest in hashes]
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+    def stats(self):
+        """Hit rate for this process plus the current cache size"""
+        with self._lock:
+            entries = self._conn.execute(
+                "SELECT COUNT(*) FROM embeddings WHERE model = ? AND normalized = ?",
+                (self.model_name, int(self.normalize))
+            ).fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                'path': self.cache_path,
+                'entries': entries,
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+            }
+
+    def _lookup(self, digests):
+        found = {}
+        digests = list(digests)
+        now = time.time()
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(digests), 500):
+                part = digests[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT text_sha256, vector FROM embeddings WHERE model = ? AND normalized = ?"
+                    f" AND text_sha256 IN ({','.join('?' * len(part))})",
+                    (self.model_name, int(self.normalize), *part)
+                ).fetchall()
+                for digest, blob in rows:
+                    found[digest] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND normalized = ? AND text_sha256 = ?",
+                    [(now, self.model_name, int(self.normalize), digest) for digest in found]
+                )
+                self._conn.commit()
+        return found
+
+    def _store(self, vectors):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)",
+                [(self.model_name, int(self.normalize), digest, vector.tobytes(), now)
+                 for digest, vector in vectors.items()]
+            )
+            excess = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN"
+                    " (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)", (excess,)
+                )
+                self.evictions += excess
+            self._conn.commit()
@@ -0,0 +1,59 @@
+"""
+Fake Streaming Chat Model
+Local stand-in for the Groq LLM with configurable latency and token rate, for tests and benchmarks without network
+"""
+
+import re
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+DEFAULT_RESPONSE = (
+    "Diabetes is a chronic condition in which blood glucose stays above the normal range, "
+    "either because the body makes too little insulin or cannot use it effectively. "
+    "Regular monitoring, a balanced diet, physical activity and prescribed medication help keep it under control. "
+    "Please consult your healthcare provider for advice specific to you."
+)
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    """
+    Chat model that answers every prompt with the same text
+
+    The answer is emitted word by word: the first token after
+    first_token_latency seconds, the rest at tokens_per_s. invoke() waits for
+    the whole answer, stream() yields each token as it is "generated", so
+    both paths see the timing of a real remote model.
+    """
+
+    response: str = DEFAULT_RESPONSE
+    first_token_latency: float = 0.3
+    tokens_per_s: float = 50.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming"
+
+    def _tokens(self) -> Iterator[str]:
+        for i, token in enumerate(re.findall(r'\S+\s*', self.response)):
+            if i == 0:
+                time.sleep(self.first_token_latency)
+            elif self.tokens_per_s > 0:
+                time.sleep(1.0 / self.tokens_per_s)
+            yield token
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        text = ''.join(self._tokens())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        for token in self._tokens():
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
@@ -0,0 +1,19 @@
+"""
+Gunicorn Settings for the Chat Server
+Threaded workers, so concurrent chats overlap their LLM round trips instead of queueing behind one another
+Run: gunicorn server:app   (from Backend/src; this file is picked up automatically)
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# One process keeps a single copy of the embedding model and caches; each
+# thread serves one request, and LLM calls beyond LLM_MAX_CONCURRENCY wait
+# for a slot (see llm_pool.py)
+workers = int(os.environ.get('CHAT_PROCESSES', 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('CHAT_THREADS', 32))
+
+# Streaming answers can outlast the default 30 s worker timeout
+timeout = int(os.environ.get('CHAT_WORKER_TIMEOUT_S', 120))
@@ -0,0 +1,297 @@
+"""
+Incremental Ingestion for the Chroma Vector Store
+Keeps a manifest of PDF content hashes and chunk IDs so only added or changed files are embedded
+Run: python ingestion.py
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from langchain_community.document_loaders import PyPDFLoader
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+MANIFEST_NAME = "ingest_manifest.json"
+# Version 2: chunk IDs include the file name
+MANIFEST_VERSION = 2
+
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+
+# Chunks embedded and written per vector store add() call; parsed chunks are
+# streamed into batches of this size across file boundaries
+ADD_BATCH_SIZE = int(os.environ.get('INGEST_BATCH_SIZE', 256))
+
+# Processes parsing and splitting PDFs in parallel (1 = parse in this process)
+INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', os.cpu_count() or 1))
+
+
+def file_sha256(path):
+    """SHA-256 of a file's content, read in 1 MiB blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_id(name, sha256, index):
+    """
+    Stable ID for the index-th chunk of a file with the given name and content hash
+
+    The name is part of the ID so identical PDFs under different names (a
+    copy or re-upload) get their own chunks, and removing one leaves the
+    other's chunks in place.
+    """
+    name_hash = hashlib.sha256(name.encode('utf-8')).hexdigest()
+    return f"{name_hash[:8]}-{sha256[:16]}-{index:05d}"
+
+
+def load_manifest(manifest_path):
+    """Read the manifest, or return an empty one if it is missing or outdated"""
+    empty = {'version': MANIFEST_VERSION, 'chunk_size': CHUNK_SIZE, 'chunk_overlap': CHUNK_OVERLAP, 'files': {}}
+    if not os.path.exists(manifest_path):
+        return empty
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        return empty
+    return manifest
+
+
+def save_manifest(manifest, manifest_path):
+    """Write the manifest atomically so an interrupted sync never leaves it half-written"""
+    manifest['updated_at'] = datetime.now().isoformat()
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def index_version(manifest_path):
+    """
+    Cheap token that changes whenever a sync rewrites the manifest
+
+    Used to invalidate caches of retrieval results; None if there is no manifest.
+    """
+    try:
+        stat = os.stat(manifest_path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def scan_data_dir(data_dir, previous_files):
+    """
+    Hash every PDF in data_dir
+
+    Files whose size and modification time match the manifest reuse the
+    recorded hash instead of being read again.
+
+    Returns:
+        Dict of file name -> {'sha256', 'size', 'mtime'}
+    """
+    files = {}
+    for name in sorted(os.listdir(data_dir)):
+        if not name.endswith('.pdf'):
+            continue
+        path = os.path.join(data_dir, name)
+        stat = os.stat(path)
+        previous = previous_files.get(name)
+        if previous and previous['size'] == stat.st_size and previous['mtime'] == stat.st_mtime:
+            sha256 = previous['sha256']
+        else:
+            sha256 = file_sha256(path)
+        files[name] = {'sha256': sha256, 'size': stat.st_size, 'mtime': stat.st_mtime}
+    return files
+
+
+def load_and_split(path, sha256, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """
+    Parse one PDF and split it into chunks
+
+    Returns:
+        Tuple of (chunk IDs, chunk documents) in page order
+    """
+    pages = PyPDFLoader(path).load()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunks = splitter.split_documents(pages)
+    for chunk in chunks:
+        chunk.metadata['source_sha256'] = sha256
+    name = os.path.basename(path)
+    return [chunk_id(name, sha256, i) for i in range(len(chunks))], chunks
+
+
+def _parse_file(job):
+    """Process-pool worker: parse and split one PDF into plain (picklable) lists"""
+    name, path, sha256 = job
+    ids, chunks = load_and_split(path, sha256)
+    return name, ids, [chunk.page_content for chunk in chunks], [chunk.metadata for chunk in chunks]
+
+
+def iter_parsed_files(jobs, workers=INGEST_WORKERS):
+    """
+    Parse and split PDFs, in parallel when workers > 1
+
+    Args:
+        jobs: List of (name, path, sha256)
+        workers: Number of parser processes
+
+    Yields:
+        (name, chunk IDs, texts, metadatas) in the order of jobs, whatever the
+        worker count, so chunk order and IDs are deterministic
+    """
+    if workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            yield _parse_file(job)
+        return
+    workers = min(workers, len(jobs))
+    # Spawn rather than fork: the caller may be a multithreaded server (e.g.
+    # its warm-up thread) with torch loaded, and forked children can deadlock
+    # on locks held by other threads at fork time
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        # Parse at most two files per worker ahead of the embedder so parsed
+        # chunks do not pile up in memory when embedding is the bottleneck
+        pending = deque()
+        for job in jobs:
+            pending.append(executor.submit(_parse_file, job))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def print_progress(files_done, files_total, chunks_done, elapsed):
+    """Default progress reporter for sync_vector_db"""
+    rate = chunks_done / elapsed if elapsed > 0 else 0.0
+    print(f"  [{files_done}/{files_total} files] {chunks_done} chunks embedded ({rate:.1f} chunks/s)")
+
+
+def sync_vector_db(vector_db, data_dir, manifest_path, workers=INGEST_WORKERS,
+                   batch_size=ADD_BATCH_SIZE, progress=print_progress, lexical_index=None):
+    """
+    Bring the vector store in line with the PDFs in data_dir
+
+    Only added or changed files are parsed, split and embedded; chunks of
+    changed and removed files are deleted. A store with no manifest (built
+    before incremental ingestion) or built with different splitter settings
+    is cleared and rebuilt once.
+
+    Files are parsed by a process pool while this process embeds: chunks
+    stream into add() batches of batch_size as parsed files arrive, in file
+    name order. A file is recorded in the manifest once its last chunk has
+    been written, so an interrupted sync resumes where it stopped.
+
+    Args:
+        vector_db: Chroma vector store
+        data_dir: Directory containing the source PDFs
+        manifest_path: Manifest file kept next to the store
+        workers: Parser processes
+        batch_size: Chunks per embedding / add() call
+        progress: Called as progress(files_done, files_total, chunks_done, elapsed_s)
+            after each completed file, or None
+        lexical_index: Optional BM25Index receiving the same adds and deletes
+
+    Returns:
+        Dict of counts: added, changed, removed, unchanged, chunks_added, chunks_deleted
+    """
+    manifest = load_manifest(manifest_path)
+    settings_changed = (manifest.get('chunk_size'), manifest.get('chunk_overlap')) != (CHUNK_SIZE, CHUNK_OVERLAP)
+    stats = {'added': 0, 'changed': 0, 'removed': 0, 'unchanged': 0, 'chunks_added': 0, 'chunks_deleted': 0}
+
+    if not manifest['files'] or settings_changed:
+        # Chunks we have no record of cannot be updated incrementally
+        stale_ids = vector_db.get(include=[])['ids']
+        if stale_ids:
+            print(f"Clearing {len(stale_ids)} untracked chunks before rebuilding...")
+            vector_db.delete(ids=stale_ids)
+            stats['chunks_deleted'] += len(stale_ids)
+        if lexical_index is not None:
+            lexical_index.clear()
+        manifest = {'version': MANIFEST_VERSION, 'files': {}}
+
+    current = scan_data_dir(data_dir, manifest['files'])
+    previous = manifest['files']
+
+    def delete(ids):
+        vector_db.delete(ids=ids)
+        if lexical_index is not None:
+            lexical_index.delete(ids)
+
+    for name in sorted(set(previous) - set(current)):
+        delete(previous[name]['chunk_ids'])
+        stats['removed'] += 1
+        stats['chunks_deleted'] += len(previous[name]['chunk_ids'])
+        print(f"Removed {name} ({len(previous[name]['chunk_ids'])} chunks)")
+
+    jobs = []
+    for name, entry in current.items():
+        old = previous.get(name)
+        if old and old['sha256'] == entry['sha256']:
+            entry['chunk_ids'] = old['chunk_ids']
+            stats['unchanged'] += 1
+            continue
+        if old:
+            delete(old['chunk_ids'])
+            stats['chunks_deleted'] += len(old['chunk_ids'])
+        jobs.append((name, os.path.join(data_dir, name), entry['sha256']))
+
+    def record_progress():
+        done = {k: v for k, v in current.items() if 'chunk_ids' in v}
+        pending = {k: v for k, v in previous.items() if k in current and k not in done}
+        manifest['files'] = {**pending, **done}
+        manifest.update({'chunk_size': CHUNK_SIZE, 'chunk_overlap': CHUNK_OVERLAP})
+        save_manifest(manifest, manifest_path)
+
+    if jobs:
+        print(f"Ingesting {len(jobs)} PDFs with {min(workers, len(jobs))} parser process(es)...")
+    started = time.perf_counter()
+    buffer_ids, buffer_texts, buffer_metadatas = [], [], []
+    # (name, ids, position in the chunk stream just past the file's last chunk)
+    in_flight = []
+    queued = written = files_done = 0
+
+    def write(n):
+        nonlocal written, files_done
+        if n:
+            vector_db.add_texts(buffer_texts[:n], metadatas=buffer_metadatas[:n], ids=buffer_ids[:n])
+            if lexical_index is not None:
+                lexical_index.add(buffer_ids[:n], buffer_texts[:n])
+        del buffer_ids[:n], buffer_texts[:n], buffer_metadatas[:n]
+        written += n
+        while in_flight and in_flight[0][2] <= written:
+            name, ids, _ = in_flight.pop(0)
+            current[name]['chunk_ids'] = ids
+            stats['changed' if name in previous else 'added'] += 1
+            files_done += 1
+            record_progress()
+            if progress:
+                progress(files_done, len(jobs), written, time.perf_counter() - started)
+
+    for name, ids, texts, metadatas in iter_parsed_files(jobs, workers):
+        buffer_ids.extend(ids)
+        buffer_texts.extend(texts)
+        buffer_metadatas.extend(metadatas)
+        queued += len(ids)
+        in_flight.append((name, ids, queued))
+        stats['chunks_added'] += len(ids)
+        while len(buffer_ids) >= batch_size:
+            write(batch_size)
+    write(len(buffer_ids))
+
+    manifest['files'] = current
+    manifest.update({'chunk_size': CHUNK_SIZE, 'chunk_overlap': CHUNK_OVERLAP})
+    save_manifest(manifest, manifest_path)
+    return stats
+
+
+if __name__ == "__main__":
+    from main import load_vector_db
+
+    print("Syncing vector database with Data/...")
+    load_vector_db()
@@ -0,0 +1,125 @@
+"""
+LLM Call Pooling
+Caps concurrent LLM calls across request threads, with a wait limit and a per-call deadline
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class LLMBusyError(Exception):
+    """No LLM slot became free within the wait limit"""
+
+
+class LLMTimeoutError(Exception):
+    """An LLM call ran past its deadline"""
+
+
+class LLMGate:
+    """
+    Counting semaphore for in-flight LLM calls
+
+    At most max_concurrent calls run at once; a caller waits up to
+    wait_timeout seconds for a slot and then gets LLMBusyError, so a backlog
+    turns into fast 503s instead of requests queueing without limit.
+    """
+
+    def __init__(self, max_concurrent=8, wait_timeout=10.0):
+        """
+        Args:
+            max_concurrent: LLM calls allowed in flight
+            wait_timeout: Seconds to wait for a free slot
+        """
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be >= 1")
+
+        self.max_concurrent = max_concurrent
+        self.wait_timeout = wait_timeout
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    @contextmanager
+    def slot(self):
+        """Hold one LLM slot for the duration of the block"""
+        with self._lock:
+            self.waiting += 1
+        acquired = self._semaphore.acquire(timeout=self.wait_timeout)
+        with self._lock:
+            self.waiting -= 1
+            if not acquired:
+                self.rejected += 1
+                raise LLMBusyError(f"All {self.max_concurrent} LLM slots busy for {self.wait_timeout}s")
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+            }
+
+
+class GatedChatModel(BaseChatModel):
+    """
+    Chat model wrapper that runs every call of the wrapped model through an LLMGate
+
+    Streaming calls also stop with LLMTimeoutError once `timeout` seconds
+    have passed; when the consumer stops iterating (client disconnected),
+    the wrapped stream is closed and the slot released at once.
+    """
+
+    llm: Any
+    gate: Any
+    timeout: float = 60.0
+
+    @property
+    def _llm_type(self) -> str:
+        return f"gated-{self.llm._llm_type}"
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager: Any = None,
+                  **kwargs: Any) -> ChatResult:
+        with self.gate.slot():
+            message = self.llm.invoke(messages, stop=stop, **kwargs)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop: Optional[List[str]] = None, run_manager: Any = None,
+                **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        with self.gate.slot():
+            deadline = time.monotonic() + self.timeout if self.timeout > 0 else None
+            stream = self.llm.stream(messages, stop=stop, **kwargs)
+            try:
+                for message in stream:
+                    if deadline is not None and time.monotonic() > deadline:
+                        self.gate.record_timeout()
+                        raise LLMTimeoutError(f"LLM stream exceeded {self.timeout}s")
+                    chunk = ChatGenerationChunk(message=message)
+                    if run_manager:
+                        run_manager.on_llm_new_token(message.content, chunk=chunk)
+                    yield chunk
+            finally:
+                stream.close()
@@ -0,0 +1,117 @@
+"""
+Chat Server Load Test
+Runs the Flask chat server on a threaded local server with the fake LLM and measures throughput per concurrency level
+Run: python load_test_chat.py [--concurrency 1 2 4 8 16] [--requests 64] [--llm-latency 0.5]
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+QUESTIONS = [
+    "What is HbA1c?",
+    "What is a normal fasting blood sugar level?",
+    "How does metformin work?",
+    "What are the early symptoms of type 2 diabetes?",
+    "How does exercise affect blood sugar?",
+    "What foods should people with diabetes avoid?",
+]
+
+
+def post(url, payload, stream):
+    """
+    One chat request
+
+    Returns:
+        Tuple of (HTTP status, seconds to first body byte, total seconds)
+    """
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode(), headers={'Content-Type': 'application/json'}
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=300) as response:
+            first = None
+            while True:
+                chunk = response.read1(1024) if stream else response.read()
+                if first is None:
+                    first = time.perf_counter() - start
+                if not chunk or not stream:
+                    break
+            return response.status, first, time.perf_counter() - start
+    except urllib.error.HTTPError as e:
+        return e.code, None, time.perf_counter() - start
+
+
+def run_level(url, concurrency, n, stream):
+    """Send n requests with `concurrency` clients; returns (results, wall seconds)"""
+    payloads = [{'message': QUESTIONS[i % len(QUESTIONS)]} for i in range(n)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda payload: post(url, payload, stream), payloads))
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /api/chat against a local fake LLM")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests", type=int, default=64, help="Requests per concurrency level")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Fake LLM seconds to first token")
+    parser.add_argument("--llm-tokens-per-s", type=float, default=100.0)
+    parser.add_argument("--llm-slots", type=int, default=8, help="LLM_MAX_CONCURRENCY")
+    parser.add_argument("--stream", action="store_true", help="Use /api/chat/stream")
+    args = parser.parse_args()
+
+    # Must be set before server.py / main.py read their configuration
+    os.environ.update({
+        'LLM_BACKEND': 'fake',
+        'STARTUP_MODE': 'eager',
+        'FAKE_LLM_LATENCY_S': str(args.llm_latency),
+        'FAKE_LLM_TOKENS_PER_S': str(args.llm_tokens_per_s),
+        'LLM_MAX_CONCURRENCY': str(args.llm_slots),
+        # Every request should reach the LLM
+        'ANSWER_CACHE_SIZE': '0',
+    })
+    logging.disable(logging.INFO)
+    from werkzeug.serving import make_server
+    import server
+
+    httpd = make_server('127.0.0.1', 0, server.app, threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{httpd.server_port}/api/chat" + ("/stream" if args.stream else "")
+
+    post(url, {'message': QUESTIONS[0]}, args.stream)  # warm-up
+
+    print("=" * 78)
+    print(f"⏱️  CHAT LOAD TEST ({'stream' if args.stream else 'json'}, fake LLM {args.llm_latency}s first token, "
+          f"{args.llm_slots} LLM slots)")
+    print("=" * 78)
+    print(f"{'Clients':>8} {'Req/s':>10} {'p50 (s)':>10} {'p95 (s)':>10} {'First byte p50':>16} {'Errors':>8} {'Scaling':>9}")
+    print("-" * 78)
+    baseline = None
+    for concurrency in args.concurrency:
+        results, wall = run_level(url, concurrency, args.requests, args.stream)
+        ok = [r for r in results if r[0] == 200]
+        latencies = np.array([r[2] for r in ok]) if ok else np.zeros(1)
+        firsts = np.array([r[1] for r in ok if r[1] is not None]) if ok else np.zeros(1)
+        throughput = len(ok) / wall
+        baseline = baseline or throughput
+        print(f"{concurrency:>8} {throughput:>10.2f} {np.percentile(latencies, 50):>10.3f} "
+              f"{np.percentile(latencies, 95):>10.3f} {np.percentile(firsts, 50):>16.3f} "
+              f"{len(results) - len(ok):>8} {throughput / baseline if baseline else 0.0:>8.1f}x")
+    print("-" * 78)
+    print(f"LLM gate: {server.llm.gate.stats()}")
+    print("=" * 78)
+    httpd.shutdown()
+
+
+if __name__ == "__main__":
+    main()
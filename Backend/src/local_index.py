@@ -0,0 +1,263 @@
+"""
+Local Vector Index
+Memory-mapped matrix of normalized chunk embeddings with exact (BLAS) and IVF approximate top-k search
+Run: python local_index.py  (rebuild ./local_index from the Chroma store)
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, List
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+INDEX_VERSION = 1
+
+# Rows scored per block when the matrix is stored as float16
+SCORE_BLOCK_ROWS = 65536
+
+# k-means iterations and training sample size (per list) for the IVF index
+IVF_ITERATIONS = 10
+IVF_SAMPLES_PER_LIST = 256
+
+
+def source_version(ids):
+    """Content version of a set of chunks; chunk IDs are derived from file hashes"""
+    digest = hashlib.sha256()
+    for chunk_id in sorted(ids):
+        digest.update(chunk_id.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+def _top_k(scores, k):
+    """Positions of the k largest scores, best first"""
+    if k >= len(scores):
+        return np.argsort(-scores)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def train_ivf(vectors, nlist, seed=0):
+    """
+    Spherical k-means over the (normalized) vectors
+
+    Returns:
+        Tuple of (centroids (nlist, dim) float32, list assignment per row)
+    """
+    rng = np.random.default_rng(seed)
+    nlist = min(nlist, len(vectors))
+    sample_size = min(len(vectors), nlist * IVF_SAMPLES_PER_LIST)
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))], dtype=np.float32)
+
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(IVF_ITERATIONS):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(nlist):
+            members = sample[assign == c]
+            # An empty list keeps its previous centroid
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+        centroids = _normalize(centroids).astype(np.float32)
+
+    assign = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), SCORE_BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+        assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return centroids, assign
+
+
+class LocalVectorIndex:
+    """
+    Read-only vector index stored in a directory
+
+    vectors.npy holds one normalized embedding per chunk (float32 or float16)
+    and is memory-mapped, so opening the index is instant and its pages are
+    shared between worker processes. chunks.json holds IDs, texts and
+    metadata. Exact search scores every row with one matrix-vector product;
+    with an IVF index (ivf_lists > 0 at build time) search only scores the
+    rows of the nprobe lists whose centroids are closest to the query.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: Directory written by LocalVectorIndex.build()
+        """
+        self.path = path
+        with open(os.path.join(path, 'index.json')) as f:
+            self.info = json.load(f)
+        if self.info.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported local index version: {self.info.get('version')}")
+
+        self.vectors = np.load(os.path.join(path, 'vectors.npy'), mmap_mode='r')
+        with open(os.path.join(path, 'chunks.json')) as f:
+            chunks = json.load(f)
+        self.ids = chunks['ids']
+        self.texts = chunks['texts']
+        self.metadatas = chunks['metadatas']
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+
+        self.centroids = self.ivf_order = self.ivf_offsets = None
+        if self.info.get('ivf_lists'):
+            self.centroids = np.load(os.path.join(path, 'ivf_centroids.npy'))
+            self.ivf_order = np.load(os.path.join(path, 'ivf_order.npy'), mmap_mode='r')
+            self.ivf_offsets = np.load(os.path.join(path, 'ivf_offsets.npy'))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def source_version(self):
+        return self.info.get('source_version')
+
+    @classmethod
+    def build(cls, path, ids, vectors, texts, metadatas, dtype='float32', ivf_lists=0,
+              source_version=None, seed=0):
+        """
+        Write an index directory and open it
+
+        Args:
+            path: Output directory
+            ids, vectors, texts, metadatas: One entry per chunk
+            dtype: 'float32' or 'float16' storage for the vectors
+            ivf_lists: Number of IVF lists (0 for exact search only)
+            source_version: Token identifying the indexed content
+        """
+        if dtype not in ('float32', 'float16'):
+            raise ValueError("dtype must be 'float32' or 'float16'")
+        os.makedirs(path, exist_ok=True)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        vectors = _normalize(vectors.reshape(len(ids), -1)) if len(ids) else np.zeros((0, 0), dtype=np.float32)
+
+        def save(name, array):
+            tmp_path = os.path.join(path, name + '.tmp')
+            with open(tmp_path, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp_path, os.path.join(path, name))
+
+        def dump(name, obj):
+            tmp_path = os.path.join(path, name + '.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(obj, f)
+            os.replace(tmp_path, os.path.join(path, name))
+
+        save('vectors.npy', vectors.astype(dtype))
+        dump('chunks.json', {'ids': list(ids), 'texts': list(texts), 'metadatas': [m or {} for m in metadatas]})
+
+        ivf_lists = min(ivf_lists, len(ids))
+        if ivf_lists > 0:
+            centroids, assign = train_ivf(vectors, ivf_lists, seed)
+            order = np.argsort(assign, kind='stable').astype(np.int32)
+            offsets = np.searchsorted(assign[order], np.arange(len(centroids) + 1)).astype(np.int64)
+            save('ivf_centroids.npy', centroids)
+            save('ivf_order.npy', order)
+            save('ivf_offsets.npy', offsets)
+
+        # Written last: a directory without a matching index.json is rebuilt
+        dump('index.json', {
+            'version': INDEX_VERSION,
+            'count': len(ids),
+            'dim': int(vectors.shape[1]) if len(ids) else 0,
+            'dtype': dtype,
+            'ivf_lists': int(ivf_lists),
+            'source_version': source_version,
+        })
+        return cls(path)
+
+    def _score(self, rows, query):
+        """Dot products of the query with the given rows (all rows if None)"""
+        vectors = self.vectors if rows is None else self.vectors[rows]
+        if vectors.dtype == np.float32:
+            return vectors @ query
+        # float16 has no BLAS kernel; upcast one block at a time
+        scores = np.empty(len(vectors), dtype=np.float32)
+        for start in range(0, len(vectors), SCORE_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            scores[start:start + len(block)] = block @ query
+        return scores
+
+    def search(self, query, k=3, nprobe=None):
+        """
+        Top-k chunks by cosine similarity
+
+        Args:
+            query: Query embedding
+            k: Number of results
+            nprobe: IVF lists to scan; None or 0 searches exactly
+
+        Returns:
+            Tuple of (chunk IDs, scores), best first
+        """
+        if not len(self.ids):
+            return [], []
+        query = _normalize(np.asarray(query, dtype=np.float32))
+        if nprobe and self.centroids is not None:
+            probe = _top_k(self.centroids @ query, nprobe)
+            rows = np.concatenate([self.ivf_order[self.ivf_offsets[c]:self.ivf_offsets[c + 1]] for c in probe])
+            if not len(rows):
+                return [], []
+            rows = np.sort(rows)
+            scores = self._score(rows, query)
+            top = _top_k(scores, k)
+            return [self.ids[rows[i]] for i in top], scores[top].tolist()
+        scores = self._score(None, query)
+        top = _top_k(scores, k)
+        return [self.ids[i] for i in top], scores[top].tolist()
+
+    def documents(self, ids):
+        """Documents for chunk IDs, in the order given"""
+        rows = [self._rows[chunk_id] for chunk_id in ids if chunk_id in self._rows]
+        return [Document(page_content=self.texts[row], metadata=self.metadatas[row]) for row in rows]
+
+
+def load_or_build(path, vector_db, dtype='float32', ivf_lists=0):
+    """
+    Open the local index, rebuilding it from the Chroma store if its content changed
+
+    Chroma stays the store that ingestion writes to; the local index is a
+    read-optimized snapshot of it.
+    """
+    version = source_version(vector_db.get(include=[])['ids'])
+    try:
+        index = LocalVectorIndex(path)
+        if (index.source_version, index.info.get('dtype'), index.info.get('ivf_lists')) == \
+                (version, dtype, min(ivf_lists, len(index))):
+            return index
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+
+    data = vector_db.get(include=['embeddings', 'documents', 'metadatas'])
+    print(f"Building local vector index ({len(data['ids'])} chunks, {dtype}, {ivf_lists} IVF lists)...")
+    return LocalVectorIndex.build(
+        path, data['ids'], data['embeddings'], data['documents'], data['metadatas'],
+        dtype=dtype, ivf_lists=ivf_lists, source_version=version
+    )
+
+
+class LocalRetriever(BaseRetriever):
+    """Top-k retriever over a LocalVectorIndex"""
+
+    index: Any
+    embeddings: Any
+    k: int = 3
+    nprobe: int = 0
+
+    def _get_relevant_documents(self, query, *, run_manager=None) -> List[Document]:
+        ids, _ = self.index.search(self.embeddings.embed_query(query), self.k, self.nprobe)
+        return self.index.documents(ids)
+
+
+if __name__ == "__main__":
+    from main import LOCAL_INDEX_DTYPE, LOCAL_INDEX_IVF_LISTS, LOCAL_INDEX_PATH, load_vector_db
+
+    index = load_or_build(LOCAL_INDEX_PATH, load_vector_db(), LOCAL_INDEX_DTYPE, LOCAL_INDEX_IVF_LISTS)
+    print(f"Local index at {LOCAL_INDEX_PATH}: {len(index)} chunks, {index.info['dtype']}, "
+          f"{index.info['ivf_lists']} IVF lists")
@@ -1,17 +1,101 @@
 import os
+import time
+import httpx
 from dotenv import load_dotenv
 from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader
+from langchain_community.document_loaders import PyPDFLoader
 from langchain_community.vectorstores import Chroma
 from langchain.chains import ConversationalRetrievalChain
+from langchain.chains.conversational_retrieval.prompts import CONDENSE_QUESTION_PROMPT
+from langchain.retrievers import ContextualCompressionRetriever
 from langchain.prompts import PromptTemplate
-from langchain.memory import ConversationBufferMemory
+from langchain.memory import ConversationBufferWindowMemory
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_groq import ChatGroq
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from ingestion import MANIFEST_NAME, index_version, sync_vector_db
+from embedding_cache import CachedEmbeddings
+from batch_embedding import BatchEmbeddings
+from retrieval_cache import CachedRetriever, LRUCache
+from bm25_index import INDEX_NAME as BM25_INDEX_NAME, BM25Index
+from answer_cache import SemanticAnswerCache
+from session_memory import InMemorySessionStore, SQLiteSessionStore
+from context_budget import CompressionStats, ContextBudgetCompressor, estimate_tokens
+from llm_pool import GatedChatModel, LLMGate
 
 # Load environment variables
 load_dotenv()
 
+EMBEDDING_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+DB_PATH = "./chroma_db"
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Data')
+
+# On-disk cache of chunk embeddings, kept outside chroma_db so it survives a
+# rebuild of the index (empty path disables it)
+EMBEDDING_CACHE_PATH = os.environ.get('EMBEDDING_CACHE_PATH', './embedding_cache.sqlite3')
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get('EMBEDDING_CACHE_MAX_ENTRIES', 100000))
+
+# Corpus chunks are encoded in batches of this size, split into this many
+# shards encoded at once
+EMBED_BATCH_SIZE = int(os.environ.get('EMBED_BATCH_SIZE', 64))
+EMBED_THREADS = int(os.environ.get('EMBED_THREADS', 1))
+
+# Cache of question embeddings and retrieved chunk IDs (size 0 disables it)
+QUERY_CACHE_SIZE = int(os.environ.get('QUERY_CACHE_SIZE', 1024))
+QUERY_CACHE_TTL_S = float(os.environ.get('QUERY_CACHE_TTL_S', 3600))
+RETRIEVAL_K = 3
+
+# Retrieval backend: 'chroma', or 'local' for a memory-mapped NumPy snapshot of
+# the Chroma store (exact search, or IVF when LOCAL_INDEX_IVF_LISTS > 0)
+RETRIEVER_BACKEND = os.environ.get('RETRIEVER_BACKEND', 'chroma')
+LOCAL_INDEX_PATH = os.environ.get('LOCAL_INDEX_PATH', './local_index')
+LOCAL_INDEX_DTYPE = os.environ.get('LOCAL_INDEX_DTYPE', 'float32')
+LOCAL_INDEX_IVF_LISTS = int(os.environ.get('LOCAL_INDEX_IVF_LISTS', 0))
+LOCAL_INDEX_NPROBE = int(os.environ.get('LOCAL_INDEX_NPROBE', 8))
+
+# 'hybrid' fuses dense results with a BM25 index (kept in chroma_db and
+# updated by ingestion) over HYBRID_CANDIDATES results each; 'dense' is
+# embeddings only
+RETRIEVAL_MODE = os.environ.get('RETRIEVAL_MODE', 'dense')
+HYBRID_CANDIDATES = int(os.environ.get('HYBRID_CANDIDATES', 20))
+
+# Answers to first-turn questions reused for close paraphrases with the same
+# sources (size 0 disables it)
+ANSWER_CACHE_SIZE = int(os.environ.get('ANSWER_CACHE_SIZE', 0))
+ANSWER_CACHE_THRESHOLD = float(os.environ.get('ANSWER_CACHE_THRESHOLD', 0.95))
+ANSWER_CACHE_TTL_S = float(os.environ.get('ANSWER_CACHE_TTL_S', 86400))
+
+# Conversation history: turns kept per session, and where sessions live
+# ('memory' or 'sqlite')
+SESSION_HISTORY_TURNS = int(os.environ.get('SESSION_HISTORY_TURNS', 3))
+SESSION_STORE = os.environ.get('SESSION_STORE', 'memory')
+SESSION_DB_PATH = os.environ.get('SESSION_DB_PATH', './sessions.sqlite3')
+SESSION_MAX = int(os.environ.get('SESSION_MAX', 1000))
+SESSION_IDLE_TTL_S = float(os.environ.get('SESSION_IDLE_TTL_S', 1800))
+
+# Context budget between retrieval and generation: trim chunk overlap, drop
+# sentences less similar to the question than CONTEXT_MIN_RELEVANCE and cap
+# the retrieved context alone at CONTEXT_TOKEN_BUDGET (estimated) tokens.
+# Sentence vectors are kept in memory for CONTEXT_SENTENCE_CACHE_SIZE sentences
+CONTEXT_COMPRESSION = os.environ.get('CONTEXT_COMPRESSION', '0') == '1'
+CONTEXT_TOKEN_BUDGET = int(os.environ.get('CONTEXT_TOKEN_BUDGET', 300))
+CONTEXT_MIN_RELEVANCE = float(os.environ.get('CONTEXT_MIN_RELEVANCE', 0.2))
+CONTEXT_SENTENCE_CACHE_SIZE = int(os.environ.get('CONTEXT_SENTENCE_CACHE_SIZE', 10000))
+
+# Whole-prompt budget (template, chat history, question and context): the
+# oldest chat turns are dropped until the prompt fits with CONTEXT_TOKEN_BUDGET
+# tokens left for context (0 disables)
+PROMPT_TOKEN_BUDGET = int(os.environ.get('PROMPT_TOKEN_BUDGET', 0))
+
+# Context token counts per request (recorded whether or not compression is on)
+context_stats = CompressionStats()
+
+# LLM calls in flight at once across request threads, seconds a call may wait
+# for a slot, and the per-call timeout / retries of the Groq client
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 8))
+LLM_WAIT_TIMEOUT_S = float(os.environ.get('LLM_WAIT_TIMEOUT_S', 10))
+LLM_TIMEOUT_S = float(os.environ.get('LLM_TIMEOUT_S', 60))
+LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', 2))
+
 def load_documents():
     """Load PDF documents from the Data directory"""
     data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'Data')
@@ -26,7 +110,14 @@ def load_documents():
     return documents
 
 def initialize_llm():
-    """Initialize the Groq LLM with Llama model"""
+    """Initialize the Groq LLM with Llama model (LLM_BACKEND=fake: local fake model, no network)"""
+    if os.getenv('LLM_BACKEND') == 'fake':
+        from fake_llm import FakeStreamingChatModel
+        return FakeStreamingChatModel(
+            first_token_latency=float(os.getenv('FAKE_LLM_LATENCY_S', 0.3)),
+            tokens_per_s=float(os.getenv('FAKE_LLM_TOKENS_PER_S', 50))
+        )
+    
     groq_api_key = os.getenv('GROQ_API_KEY')
     if not groq_api_key:
         raise ValueError("GROQ_API_KEY environment variable is not set")
@@ -34,49 +125,171 @@ def initialize_llm():
     return ChatGroq(
         temperature=0,
         groq_api_key=groq_api_key,
-        model_name="llama-3.3-70b-versatile"  
+        model_name="llama-3.3-70b-versatile",
+        request_timeout=LLM_TIMEOUT_S,
+        max_retries=LLM_MAX_RETRIES,
+        # One keep-alive connection pool reused by every request thread
+        http_client=httpx.Client(
+            limits=httpx.Limits(max_connections=LLM_MAX_CONCURRENCY, max_keepalive_connections=LLM_MAX_CONCURRENCY),
+            timeout=LLM_TIMEOUT_S
+        )
     )
 
-def create_vector_db():
-    """Create and persist the vector database from PDF documents"""
-    # Load documents from the Data directory
-    data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'Data')
-    loader = DirectoryLoader(data_dir, glob='*.pdf', loader_cls=PyPDFLoader)
-    documents = loader.load()
-    
-    # Split documents into chunks
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=500,
-        chunk_overlap=50
+def limit_llm_concurrency(llm):
+    """Wrap an LLM so at most LLM_MAX_CONCURRENCY calls are in flight (see llm_pool.py)"""
+    return GatedChatModel(
+        llm=llm,
+        gate=LLMGate(LLM_MAX_CONCURRENCY, LLM_WAIT_TIMEOUT_S),
+        timeout=LLM_TIMEOUT_S
     )
-    texts = text_splitter.split_documents(documents)
-    
-    # Create embeddings
+
+def get_embeddings():
+    """Create the embedding model shared by indexing and queries"""
     embeddings = HuggingFaceEmbeddings(
-        model_name='sentence-transformers/all-MiniLM-L6-v2',
-        encode_kwargs={'normalize_embeddings': True}  # Enable normalization for better results
+        model_name=EMBEDDING_MODEL,
+        encode_kwargs={
+            'normalize_embeddings': True,  # Enable normalization for better results
+            'batch_size': EMBED_BATCH_SIZE
+        }
     )
+    embeddings = BatchEmbeddings(embeddings, batch_size=EMBED_BATCH_SIZE, threads=EMBED_THREADS)
+    if not EMBEDDING_CACHE_PATH:
+        return embeddings
     
-    # Create and persist vector store
-    vector_db = Chroma.from_documents(
-        documents=texts,
-        embedding=embeddings,
-        persist_directory='./chroma_db'
+    # Unchanged chunk text is served from the cache; only misses reach the batcher
+    return CachedEmbeddings(
+        embeddings,
+        model_name=EMBEDDING_MODEL,
+        normalize=True,
+        cache_path=EMBEDDING_CACHE_PATH,
+        max_entries=EMBEDDING_CACHE_MAX_ENTRIES
     )
-    vector_db.persist()
+
+def model_embeddings(embeddings):
+    """The embedding model inside the corpus cache and batch wrappers"""
+    while isinstance(embeddings, (CachedEmbeddings, BatchEmbeddings)):
+        embeddings = embeddings.embeddings
+    return embeddings
+
+def load_vector_db(db_path=DB_PATH, embeddings=None, data_dir=DATA_DIR):
+    """
+    Open the persisted vector database and sync it with the PDFs in Data/
+    
+    Only PDFs added or changed since the last sync are parsed and embedded,
+    and chunks of removed PDFs are deleted (see ingestion.py).
+    """
+    os.makedirs(db_path, exist_ok=True)
+    vector_db = Chroma(persist_directory=db_path, embedding_function=embeddings or get_embeddings())
     
+    # The BM25 index receives the same incremental adds and deletes
+    lexical_index = get_lexical_index(db_path)
+    stats = sync_vector_db(
+        vector_db, data_dir, os.path.join(db_path, MANIFEST_NAME), lexical_index=lexical_index
+    )
+    if lexical_index is not None and lexical_index.sync_with(vector_db):
+        print(f"BM25 index rebuilt ({len(lexical_index)} chunks)")
+    print(
+        f"Vector database synced: {stats['added']} added, {stats['changed']} changed, "
+        f"{stats['removed']} removed, {stats['unchanged']} unchanged PDFs "
+        f"(+{stats['chunks_added']} / -{stats['chunks_deleted']} chunks)"
+    )
+    embeddings = vector_db.embeddings
+    if isinstance(embeddings, CachedEmbeddings) and stats['chunks_added']:
+        cache = embeddings.stats()
+        print(
+            f"Embedding cache: {cache['hits']} hits, {cache['misses']} misses "
+            f"({cache['hit_ratio']:.1%}), {cache['entries']} entries"
+        )
+        embeddings = embeddings.embeddings
+    if isinstance(embeddings, BatchEmbeddings) and embeddings.chunks:
+        encoder = embeddings.stats()
+        print(
+            f"Embedded {encoder['chunks']} chunks in {encoder['seconds']:.1f}s "
+            f"({encoder['chunks_per_s']} chunks/s, batch size {encoder['batch_size']}, "
+            f"{encoder['threads']} thread(s))"
+        )
     return vector_db
 
-def setup_qa_chain(vector_db, llm):
-    """Set up the question-answering chain with custom prompt"""
-    retriever = vector_db.as_retriever(search_kwargs={"k": 3})
-    memory = ConversationBufferMemory(
-        memory_key="chat_history",
-        return_messages=True
-    )
+def create_vector_db():
+    """Create and persist the vector database from PDF documents"""
+    return load_vector_db()
+
+def get_lexical_index(db_path=DB_PATH):
+    """BM25 index stored next to the vector database, or None unless RETRIEVAL_MODE=hybrid"""
+    if RETRIEVAL_MODE not in ('dense', 'hybrid'):
+        raise ValueError(f"Unknown RETRIEVAL_MODE: {RETRIEVAL_MODE!r} (expected 'dense' or 'hybrid')")
+    if RETRIEVAL_MODE != 'hybrid':
+        return None
+    os.makedirs(db_path, exist_ok=True)
+    return BM25Index(os.path.join(db_path, BM25_INDEX_NAME))
+
+def get_retriever(vector_db, db_path=DB_PATH):
+    """
+    Top-k retriever over the vector database
+    
+    With RETRIEVER_BACKEND=local, search runs on a local NumPy index that is
+    rebuilt from Chroma whenever the indexed chunks change. With
+    RETRIEVAL_MODE=hybrid, dense and BM25 results are fused. Repeated questions
+    are answered from a cache of question embeddings and retrieved chunk IDs,
+    invalidated whenever a sync rewrites the manifest.
+    """
+    if RETRIEVER_BACKEND not in ('chroma', 'local'):
+        raise ValueError(f"Unknown RETRIEVER_BACKEND: {RETRIEVER_BACKEND!r} (expected 'chroma' or 'local')")
+    local_index = None
+    nprobe = LOCAL_INDEX_NPROBE if LOCAL_INDEX_IVF_LISTS > 0 else 0
+    if RETRIEVER_BACKEND == 'local':
+        from local_index import load_or_build
+        local_index = load_or_build(LOCAL_INDEX_PATH, vector_db, LOCAL_INDEX_DTYPE, LOCAL_INDEX_IVF_LISTS)
     
-    # Define custom prompt template focused on diabetes
-    prompt_template = """
+    lexical_index = get_lexical_index(db_path)
+    
+    if QUERY_CACHE_SIZE <= 0 and lexical_index is None:
+        if local_index is not None:
+            from local_index import LocalRetriever
+            return LocalRetriever(index=local_index, embeddings=vector_db.embeddings, k=RETRIEVAL_K, nprobe=nprobe)
+        return vector_db.as_retriever(search_kwargs={"k": RETRIEVAL_K})
+    manifest_path = os.path.join(db_path, MANIFEST_NAME)
+    return CachedRetriever(
+        vector_db=vector_db,
+        k=RETRIEVAL_K,
+        embedding_cache=LRUCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL_S) if QUERY_CACHE_SIZE > 0 else None,
+        results_cache=LRUCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL_S) if QUERY_CACHE_SIZE > 0 else None,
+        index_version=lambda: index_version(manifest_path),
+        local_index=local_index,
+        nprobe=nprobe,
+        lexical_index=lexical_index,
+        candidates=HYBRID_CANDIDATES
+    )
+
+def get_answer_cache():
+    """Semantic answer cache for first-turn questions, or None if disabled"""
+    if ANSWER_CACHE_SIZE <= 0:
+        return None
+    return SemanticAnswerCache(
+        threshold=ANSWER_CACHE_THRESHOLD,
+        maxsize=ANSWER_CACHE_SIZE,
+        ttl=ANSWER_CACHE_TTL_S
+    )
+
+def get_session_store():
+    """Store of per-session chat history selected by SESSION_STORE"""
+    if SESSION_STORE == 'sqlite':
+        return SQLiteSessionStore(
+            SESSION_DB_PATH,
+            max_turns=SESSION_HISTORY_TURNS,
+            max_sessions=SESSION_MAX,
+            idle_ttl=SESSION_IDLE_TTL_S
+        )
+    if SESSION_STORE != 'memory':
+        raise ValueError(f"Unknown SESSION_STORE: {SESSION_STORE!r} (expected 'memory' or 'sqlite')")
+    return InMemorySessionStore(
+        max_turns=SESSION_HISTORY_TURNS,
+        max_sessions=SESSION_MAX,
+        idle_ttl=SESSION_IDLE_TTL_S
+    )
+
+# Custom prompt template focused on diabetes
+QA_PROMPT_TEMPLATE = """
     You are a specialized AI assistant focused on diabetes care and management. You provide accurate, empathetic, and helpful information about diabetes while maintaining a professional and supportive tone.
 
     Guidelines for responses:
@@ -115,39 +328,157 @@ def setup_qa_chain(vector_db, llm):
     Human Question: {question}
 
     Assistant Response: """
+
+QA_PROMPT = PromptTemplate(
+    template=QA_PROMPT_TEMPLATE,
+    input_variables=['context', 'chat_history', 'question']
+)
+
+def setup_qa_chain(vector_db, llm, retriever=None, use_memory=True):
+    """
+    Set up the question-answering chain with custom prompt
     
-    PROMPT = PromptTemplate(
-        template=prompt_template,
-        input_variables=['context', 'chat_history', 'question']
+    With use_memory the chain keeps the last SESSION_HISTORY_TURNS turns of a
+    single conversation itself (CLI). Without it the chain is stateless and
+    callers pass chat_history, a list of (question, answer), on every call,
+    so one chain can serve many sessions (server).
+    """
+    retriever = retriever or get_retriever(vector_db)
+    retriever = ContextualCompressionRetriever(
+        base_compressor=ContextBudgetCompressor(
+            # Sentences must not fill the on-disk chunk embedding cache
+            embeddings=model_embeddings(vector_db.embeddings),
+            enabled=CONTEXT_COMPRESSION,
+            token_budget=CONTEXT_TOKEN_BUDGET,
+            min_relevance=CONTEXT_MIN_RELEVANCE,
+            embed_query=retriever.embed_question if isinstance(retriever, CachedRetriever) else None,
+            sentence_cache=LRUCache(CONTEXT_SENTENCE_CACHE_SIZE, 0) if CONTEXT_SENTENCE_CACHE_SIZE > 0 else None,
+            stats=context_stats
+        ),
+        base_retriever=retriever
     )
+    memory = None
+    if use_memory:
+        memory = ConversationBufferWindowMemory(
+            k=SESSION_HISTORY_TURNS,
+            memory_key="chat_history",
+            return_messages=True
+        )
     
     qa_chain = ConversationalRetrievalChain.from_llm(
         llm=llm,
         retriever=retriever,
         memory=memory,
-        combine_docs_chain_kwargs={"prompt": PROMPT}
+        combine_docs_chain_kwargs={"prompt": QA_PROMPT}
     )
     
     return qa_chain
 
+def format_chat_history(chat_history):
+    """Render (question, answer) turns the way ConversationalRetrievalChain does"""
+    return "".join(f"\nHuman: {question}\nAssistant: {answer}" for question, answer in chat_history)
+
+def estimate_prompt_tokens(question, chat_history, context_tokens):
+    """Approximate size of the final QA prompt"""
+    return (
+        estimate_tokens(QA_PROMPT_TEMPLATE) + estimate_tokens(format_chat_history(chat_history))
+        + estimate_tokens(question) + context_tokens
+    )
+
+def fit_chat_history(question, chat_history, budget=PROMPT_TOKEN_BUDGET):
+    """
+    The most recent turns of chat_history that fit the prompt budget
+    
+    Oldest turns are dropped until the estimated prompt, with
+    CONTEXT_TOKEN_BUDGET tokens reserved for context, is within budget, so
+    history is trimmed before context. A budget of 0 keeps every turn.
+    """
+    chat_history = list(chat_history)
+    if budget <= 0:
+        return chat_history
+    while chat_history and estimate_prompt_tokens(question, chat_history, CONTEXT_TOKEN_BUDGET) > budget:
+        chat_history.pop(0)
+    return chat_history
+
+def stream_answer(llm, retriever, question, chat_history=(), callbacks=None):
+    """
+    Answer a question like the QA chain, but yield the answer as it is generated
+    
+    A follow-up question is first rewritten into a standalone one (as the
+    chain does), then chunks are retrieved and the final prompt is streamed
+    from the LLM.
+    
+    Returns:
+        Tuple of (source documents, iterator of answer text chunks)
+    """
+    config = {"callbacks": callbacks} if callbacks else None
+    history = format_chat_history(chat_history)
+    if chat_history:
+        question = llm.invoke(
+            CONDENSE_QUESTION_PROMPT.format(chat_history=history, question=question), config=config
+        ).content
+    docs = retriever.invoke(question, config=config)
+    prompt = QA_PROMPT.format(
+        context="\n\n".join(doc.page_content for doc in docs),
+        chat_history=history,
+        question=question
+    )
+    tokens = (chunk.content for chunk in llm.stream(prompt, config=config) if chunk.content)
+    return docs, tokens
+
+class StageTimer(BaseCallbackHandler):
+    """
+    Callback handler timing the retrieval and LLM calls of one request
+    
+    Each finished call is reported as observe('retrieval' | 'llm_generation',
+    seconds). Runs nested in a timed run (the compression retriever's base
+    retriever) are not reported separately. Failed calls are not reported.
+    """
+    
+    def __init__(self, observe):
+        self.observe = observe
+        self._runs = {}
+    
+    def _start(self, stage, run_id, parent_run_id):
+        if parent_run_id not in self._runs:
+            self._runs[run_id] = (stage, time.perf_counter())
+    
+    def _end(self, run_id):
+        run = self._runs.pop(run_id, None)
+        if run:
+            self.observe(run[0], time.perf_counter() - run[1])
+    
+    def _error(self, run_id):
+        self._runs.pop(run_id, None)
+    
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs):
+        self._start('retrieval', run_id, parent_run_id)
+    
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end(run_id)
+    
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._error(run_id)
+    
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        self._start('llm_generation', run_id, parent_run_id)
+    
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._start('llm_generation', run_id, parent_run_id)
+    
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end(run_id)
+    
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._error(run_id)
+
 if __name__ == "__main__":
     print("Initializing the Diabetes Assistant...")
     llm = initialize_llm()
     
-    # Check if vector database already exists
-    db_path = "./chroma_db"
-    print("Checking for existing vector database...")
-    
-    if os.path.exists(db_path) and os.listdir(db_path):
-        print("Loading existing vector database...")
-        embeddings = HuggingFaceEmbeddings(
-            model_name='sentence-transformers/all-MiniLM-L6-v2',
-            encode_kwargs={'normalize_embeddings': True}
-        )
-        vector_store = Chroma(persist_directory=db_path, embedding_function=embeddings)
-    else:
-        print("Creating new vector database...")
-        vector_store = create_vector_db()
+    # Open the vector database, embedding only new or changed PDFs
+    print("Syncing vector database...")
+    vector_store = load_vector_db()
     
     print("Setting up QA chain...")
     qa_chain = setup_qa_chain(vector_store, llm)
@@ -0,0 +1,220 @@
+"""
+Query and Retrieval Cache
+LRU/TTL caches of question embeddings and retrieved chunk IDs, so repeated questions skip the model and the vector search
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from bm25_index import reciprocal_rank_fusion
+
+
+def normalize_question(text):
+    """Cache key for a question: lower case, single spaces, no trailing punctuation"""
+    return re.sub(r'\s+', ' ', text).strip().lower().rstrip('?!. ')
+
+
+class LRUCache:
+    """Thread-safe LRU cache with per-entry TTL and hit/miss counters"""
+
+    def __init__(self, maxsize=1024, ttl=3600.0):
+        """
+        Args:
+            maxsize: Maximum number of entries before the least recently used is evicted
+            ttl: Seconds an entry stays valid (0 or less disables expiry)
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be >= 1")
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by clear(); puts computed against an older generation are dropped
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Return the cached value or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at is not None and now >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, generation=None):
+        """
+        Store a value
+
+        Args:
+            generation: Value of self.generation read before the value was
+                computed; the put is ignored if the cache was cleared since
+        """
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else None
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+            self.invalidations += 1
+
+    def stats(self):
+        """Hit/miss/eviction counters and current occupancy"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+class CachedRetriever(BaseRetriever):
+    """
+    Top-k Chroma (or local index) retriever with a question cache in front
+
+    A question is normalized and looked up in two caches: the IDs of the
+    chunks it retrieved last time (a hit only costs a fetch by ID) and its
+    embedding (a hit skips the model but still searches). Both caches are
+    cleared whenever index_version() changes, so a re-synced index never
+    serves stale chunk IDs. Either cache may be None to disable it.
+
+    With a lexical_index, the top `candidates` dense and BM25 results are
+    merged by reciprocal rank fusion, so exact terms such as drug names
+    reach the top k without raising k.
+    """
+
+    vector_db: Any
+    k: int = 3
+    embedding_cache: Any = None
+    results_cache: Any = None
+    # Returns a token identifying the indexed content (e.g. ingestion.index_version)
+    index_version: Optional[Callable[[], Any]] = None
+    # Optional LocalVectorIndex searched instead of Chroma, probing nprobe IVF lists
+    local_index: Any = None
+    nprobe: int = 0
+    # Optional BM25Index fused with the dense results over this many candidates each
+    lexical_index: Any = None
+    candidates: int = 20
+    current_version: Any = None
+
+    def check_version(self):
+        """Clear both caches if the index changed since the last call"""
+        if self.index_version is None:
+            return
+        version = self.index_version()
+        if version != self.current_version:
+            for cache in (self.embedding_cache, self.results_cache):
+                if cache is not None:
+                    cache.clear()
+            self.current_version = version
+
+    def embed_question(self, question):
+        """Question embedding, from the cache when possible"""
+        if self.embedding_cache is None:
+            return self.vector_db.embeddings.embed_query(question)
+        key = normalize_question(question)
+        vector = self.embedding_cache.get(key)
+        if vector is None:
+            generation = self.embedding_cache.generation
+            vector = self.vector_db.embeddings.embed_query(question)
+            self.embedding_cache.put(key, vector, generation)
+        return vector
+
+    def dense_search(self, question, n, vector=None):
+        """IDs of the n chunks whose embeddings are closest to the question"""
+        if vector is None:
+            vector = self.embed_question(question)
+        if self.local_index is not None:
+            return self.local_index.search(vector, n, self.nprobe)[0]
+        result = self.vector_db._collection.query(
+            query_embeddings=[vector],
+            n_results=n,
+            include=[]
+        )
+        return result['ids'][0]
+
+    def search(self, question, vector=None):
+        """
+        IDs of the k best chunks for the question (dense, or fused with BM25)
+
+        Args:
+            vector: Question embedding, if already computed
+        """
+        if self.lexical_index is None:
+            return self.dense_search(question, self.k, vector)
+        dense = self.dense_search(question, self.candidates, vector)
+        lexical = [chunk_id for chunk_id, _ in self.lexical_index.search(question, self.candidates)]
+        return reciprocal_rank_fusion([dense, lexical], self.k)
+
+    def fetch(self, ids):
+        """Documents for chunk IDs, in the order given"""
+        if not ids:
+            return []
+        if self.local_index is not None:
+            return self.local_index.documents(ids)
+        found = self.vector_db.get(ids=list(ids), include=['documents', 'metadatas'])
+        by_id = {
+            chunk_id: Document(page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(found['ids'], found['documents'], found['metadatas'])
+        }
+        return [by_id[chunk_id] for chunk_id in ids if chunk_id in by_id]
+
+    def retrieve_ids(self, question):
+        """IDs of the chunks retrieved for a question, from the cache when possible"""
+        self.check_version()
+        if self.results_cache is None:
+            return tuple(self.search(question))
+        key = normalize_question(question)
+        ids = self.results_cache.get(key)
+        if ids is None:
+            generation = self.results_cache.generation
+            ids = tuple(self.search(question))
+            self.results_cache.put(key, ids, generation)
+        return ids
+
+    def _get_relevant_documents(self, query, *, run_manager=None) -> List[Document]:
+        return self.fetch(self.retrieve_ids(query))
+
+    def stats(self):
+        """Hit ratios of both caches"""
+        return {
+            'embeddings': self.embedding_cache.stats() if self.embedding_cache is not None else None,
+            'results': self.results_cache.stats() if self.results_cache is not None else None,
+        }
@@ -1,14 +1,15 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from main import initialize_llm, setup_qa_chain, create_vector_db
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
 import os
+import json
+import time
 import logging
+import threading
 from datetime import datetime
+from instrumentation import RequestInstrumentation
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging (DEBUG adds full request and response dumps)
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
@@ -20,90 +21,285 @@ CORS(app,
      allow_headers=["Content-Type", "Authorization"],
      supports_credentials=True)
 
+# Request counters and per-stage latency histograms at /metrics; one JSON log
+# line per sampled, failed (5xx) or slow request
+instrumentation = RequestInstrumentation(
+    app,
+    'diasense_chat',
+    logger,
+    sample_rate=float(os.environ.get('LOG_SAMPLE_RATE', 0.01)),
+    slow_request_s=float(os.environ.get('LOG_SLOW_REQUEST_MS', 10000)) / 1000
+)
+
+# 'background': serve /health immediately and load the RAG stack in a thread;
+# 'eager': load everything before the module finishes importing
+STARTUP_MODE = os.environ.get('STARTUP_MODE', 'background')
+
+# Seconds clients are asked to wait before retrying while the stack loads
+RETRY_AFTER_S = 5
+
 # Initialize global variables
+rag = None  # main.py, imported by the warm-up (it pulls in langchain, torch, chromadb)
+llm = None
 qa_chain = None
 vector_db = None
+retriever = None
+embedding_cache = None
+answer_cache = None
+session_store = None
+
+STAGES = ('llm', 'embeddings', 'vector_store')
+startup = {
+    'status': 'pending',  # pending -> loading -> ready | failed
+    'stages': {stage: {'status': 'pending'} for stage in STAGES},
+    'error': None
+}
+startup_lock = threading.Lock()
+
+instrumentation.metrics.gauge('ready', 'Whether the RAG stack has finished loading',
+                              lambda: int(startup['status'] == 'ready'))
+instrumentation.metrics.gauge('llm_in_flight', 'LLM calls in flight',
+                              lambda: llm.gate.stats()['in_flight'] if llm else None)
+instrumentation.metrics.gauge('llm_waiting', 'Requests waiting for an LLM slot',
+                              lambda: llm.gate.stats()['waiting'] if llm else None)
+
+def run_stage(stage, load):
+    """Run one warm-up stage, recording its status and duration in `startup`"""
+    startup['stages'][stage] = {'status': 'loading'}
+    started = time.perf_counter()
+    try:
+        result = load()
+    except Exception as e:
+        startup['stages'][stage] = {'status': 'failed', 'error': str(e)}
+        raise
+    startup['stages'][stage] = {'status': 'ready', 'seconds': round(time.perf_counter() - started, 2)}
+    return result
 
 def init_app():
     """Initialize the application components"""
-    global qa_chain, vector_db
+    global rag, llm, qa_chain, vector_db, retriever, embedding_cache, answer_cache, session_store
+    
+    with startup_lock:
+        if startup['status'] != 'pending':
+            return
+        startup['status'] = 'loading'
     
     logger.info("Initializing Diabetes Assistant...")
     try:
-        llm = initialize_llm()
-        db_path = "./chroma_db"
+        def load_llm():
+            global rag
+            import main as rag
+            # Shared by all request threads; caps concurrent LLM calls
+            return rag.limit_llm_concurrency(rag.initialize_llm())
+        
+        llm = run_stage('llm', load_llm)
+        embeddings = run_stage('embeddings', lambda: rag.get_embeddings())
         
-        if not os.path.exists(db_path) or not os.listdir(db_path):
-            logger.info("Creating new vector database...")
-            vector_db = create_vector_db()
-        else:
-            logger.info("Loading existing vector database...")
-            embeddings = HuggingFaceEmbeddings(model_name='sentence-transformers/all-MiniLM-L6-v2')
-            vector_db = Chroma(persist_directory=db_path, embedding_function=embeddings)
+        # Embeds only PDFs added or changed since the last start
+        logger.info("Syncing vector database...")
+        vector_db = run_stage('vector_store', lambda: rag.load_vector_db(embeddings=embeddings))
         
-        qa_chain = setup_qa_chain(vector_db, llm)
+        from embedding_cache import CachedEmbeddings
+        from retrieval_cache import CachedRetriever
+        retriever = rag.get_retriever(vector_db)
+        # History is kept per session rather than in one shared chain memory
+        qa_chain = rag.setup_qa_chain(vector_db, llm, retriever, use_memory=False)
+        session_store = rag.get_session_store()
+        # The answer cache is keyed on chunk IDs only the cached retriever exposes
+        answer_cache = rag.get_answer_cache() if isinstance(retriever, CachedRetriever) else None
+        embedding_cache = embeddings if isinstance(embeddings, CachedEmbeddings) else None
+        startup['status'] = 'ready'
         logger.info("Diabetes Assistant initialized successfully!")
     except Exception as e:
+        startup['status'] = 'failed'
+        startup['error'] = str(e)
         logger.error(f"Error initializing Diabetes Assistant: {str(e)}")
         raise
 
+def start_background_init():
+    """Load the RAG stack in a daemon thread so the server can answer /health meanwhile"""
+    def run():
+        try:
+            init_app()
+        except Exception:
+            # Already logged and reported through /health
+            pass
+    threading.Thread(target=run, name='rag-warmup', daemon=True).start()
+
+def llm_error_response(e):
+    """503 (with Retry-After) when every LLM slot is busy, 504 when the LLM timed out; None otherwise"""
+    from llm_pool import LLMBusyError, LLMTimeoutError
+    if isinstance(e, LLMBusyError):
+        response = jsonify({'error': str(e), 'status': 'error', 'timestamp': datetime.now().isoformat()})
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
+    if isinstance(e, LLMTimeoutError) or 'timeout' in type(e).__name__.lower():
+        response = jsonify({'error': str(e), 'status': 'error', 'timestamp': datetime.now().isoformat()})
+        response.status_code = 504
+        return response
+    return None
+
+def not_ready_response():
+    """503 for chat requests that arrive before the stack is loaded (or after it failed)"""
+    response = jsonify({
+        'error': 'Diabetes Assistant is still starting' if startup['status'] != 'failed'
+                 else 'Diabetes Assistant failed to start',
+        'status': 'error',
+        'startup': startup,
+        'timestamp': datetime.now().isoformat()
+    })
+    response.status_code = 503
+    if startup['status'] != 'failed':
+        response.headers['Retry-After'] = str(RETRY_AFTER_S)
+    return response
+
+def client_history(data, query):
+    """The last turns of the client's conversation_history as a list of (question, answer)"""
+    messages = data.get('conversation_history') or []
+    # The frontend sends the message being asked as the last history entry
+    if messages and str(messages[-1].get('content', '')).strip() == query.strip():
+        messages = messages[:-1]
+    turns = []
+    question = None
+    for message in messages:
+        if message.get('role') == 'user':
+            question = message.get('content', '')
+        elif message.get('role') == 'assistant' and question is not None:
+            turns.append((question, message.get('content', '')))
+            question = None
+    return turns[-rag.SESSION_HISTORY_TURNS:] if rag.SESSION_HISTORY_TURNS else []
+
+def request_history(data, query):
+    """
+    Chat history for a request as a list of (question, answer)
+
+    Requests with a session_id (or chat_id) use that session's stored turns.
+    When there is no session, or the store has no turns for it (e.g. it was
+    evicted or the server restarted), the client's conversation_history is
+    used instead, so a follow-up is never treated as a first turn.
+    """
+    session_id = data.get('session_id') or data.get('chat_id')
+    if session_id:
+        stored = session_store.history(str(session_id))
+        if stored:
+            return stored
+    return client_history(data, query)
+
+def lookup_answer_cache(query, history):
+    """
+    Look a first-turn question up in the semantic answer cache
+
+    Any prior turns, from the session store or the client, bypass the cache.
+
+    Returns:
+        Tuple of (cached answer dict or None, (embedding, chunk IDs) to store
+        the answer under, or None if the cache does not apply to this turn)
+    """
+    if history or not answer_cache:
+        return None, None
+    with instrumentation.stage('answer_cache'):
+        embedding = retriever.embed_question(query)
+        chunk_ids = retriever.retrieve_ids(query)
+        return answer_cache.get(embedding, chunk_ids), (embedding, chunk_ids)
+
+def answer_question(query, history):
+    """
+    Run the QA chain, answering first-turn paraphrases from the answer cache
+
+    Returns:
+        Tuple of (answer, sources, cache similarity or None on a cache miss)
+    """
+    cached, cache_key = lookup_answer_cache(query, history)
+    if cached:
+        return cached['answer'], cached['sources'], cached['similarity']
+    
+    result = qa_chain(
+        {"question": query, "chat_history": rag.fit_chat_history(query, history)},
+        callbacks=[rag.StageTimer(instrumentation.observe_stage)]
+    )
+    sources = [doc.metadata for doc in result.get('source_documents', [])]
+    if cache_key:
+        answer_cache.put(*cache_key, result['answer'], sources)
+    return result['answer'], sources, None
+
+def token_counts(query, history):
+    """Context and estimated prompt tokens of the request just answered on this thread"""
+    last = rag.context_stats.last()
+    if last is None:
+        return None
+    return {
+        **last,
+        'prompt_tokens_estimate': rag.estimate_prompt_tokens(
+            query, rag.fit_chat_history(query, history), last['context_tokens_after']
+        )
+    }
+
+def sse_event(event, data):
+    """One Server-Sent Events message with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """Handle chat requests"""
+    if startup['status'] != 'ready':
+        return not_ready_response()
     try:
-        logger.info("=" * 50)
-        logger.info("🔥 BACKEND: Chat request received")
-        logger.info(f"📨 Request headers: {dict(request.headers)}")
-        logger.info(f"📨 Request method: {request.method}")
-        logger.info(f"📨 Request URL: {request.url}")
-        logger.info(f"📨 Request data: {request.get_data(as_text=True)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"📨 Chat request headers: {dict(request.headers)}")
+            logger.debug(f"📨 Chat request data: {request.get_data(as_text=True)}")
         
-        if not request.is_json:
-            logger.error("❌ Request is not JSON")
-            return jsonify({
-                'error': 'Content-Type must be application/json',
-                'status': 'error'
-            }), 400
-
-        data = request.json
-        logger.info(f"📋 Parsed JSON data: {data}")
-        
-        query = data.get('message')
-        logger.info(f"💬 Extracted message: {query}")
-        
-        if not query:
-            logger.error("No message provided in request")
-            return jsonify({
-                'error': 'No message provided in request body',
-                'status': 'error'
-            }), 400
+        with instrumentation.stage('parse'):
+            if not request.is_json:
+                logger.debug("❌ Request is not JSON")
+                return jsonify({
+                    'error': 'Content-Type must be application/json',
+                    'status': 'error'
+                }), 400
+            data = request.json
         
-        logger.info(f"Processing query: {query}")
+        with instrumentation.stage('validation'):
+            query = data.get('message')
+            if not query:
+                logger.debug("No message provided in request")
+                return jsonify({
+                    'error': 'No message provided in request body',
+                    'status': 'error'
+                }), 400
         
-        # Get response from the chatbot
-        logger.info("🤖 Calling AI model...")
-        result = qa_chain({"question": query})
-        logger.info(f"🤖 AI response received: {result['answer'][:100]}...")
+        session_id = data.get('session_id') or data.get('chat_id')
+        with instrumentation.stage('history'):
+            history = request_history(data, query)
+        rag.context_stats.reset_last()
+        answer, sources, similarity = answer_question(query, history)
+        if session_id:
+            with instrumentation.stage('history'):
+                session_store.append(str(session_id), query, answer)
         
         # Format response for frontend
         formatted_response = {
-            'response': result['answer'],
+            'response': answer,
             'status': 'success',
             'metadata': {
                 'timestamp': datetime.now().isoformat(),
                 'query_processed': query,
                 'response_type': 'text',
-                'sources': [doc.metadata for doc in result.get('source_documents', [])]
+                'sources': sources,
+                'answer_cached': similarity is not None,
+                'tokens': token_counts(query, history)
             }
         }
+        if similarity is not None:
+            formatted_response['metadata']['answer_cache_similarity'] = similarity
         
-        logger.info("✅ Generated response successfully")
-        logger.info(f"📤 Sending response: {formatted_response}")
-        logger.info("=" * 50)
-        
+        logger.debug("📤 Sending response: %s", formatted_response)
         return jsonify(formatted_response)
 
     except Exception as e:
+        busy = llm_error_response(e)
+        if busy is not None:
+            logger.warning(f"LLM unavailable: {str(e)}")
+            return busy
         logger.error(f"Error in chat endpoint: {str(e)}", exc_info=True)
         return jsonify({
             'error': str(e),
@@ -112,13 +308,128 @@ def chat():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Handle chat requests, streaming the answer as Server-Sent Events
+    
+    Emits a `token` event ({"text": ...}) per chunk of the answer as the LLM
+    generates it, then one `done` event with the full response, sources and
+    metadata (same shape as /api/chat), or an `error` event.
+    """
+    if startup['status'] != 'ready':
+        return not_ready_response()
+    with instrumentation.stage('parse'):
+        if not request.is_json:
+            return jsonify({
+                'error': 'Content-Type must be application/json',
+                'status': 'error'
+            }), 400
+        data = request.json
+    
+    with instrumentation.stage('validation'):
+        query = data.get('message')
+        if not query:
+            return jsonify({
+                'error': 'No message provided in request body',
+                'status': 'error'
+            }), 400
+    
+    session_id = data.get('session_id') or data.get('chat_id')
+    with instrumentation.stage('history'):
+        history = request_history(data, query)
+    
+    def generate():
+        started = time.perf_counter()
+        first_token_s = None
+        tokens = None
+        rag.context_stats.reset_last()
+        try:
+            cached, cache_key = lookup_answer_cache(query, history)
+            if cached:
+                sources = cached['sources']
+                tokens = [cached['answer']]
+            else:
+                # The chain's retriever applies the context budget
+                docs, tokens = rag.stream_answer(
+                    llm, qa_chain.retriever, query, rag.fit_chat_history(query, history),
+                    callbacks=[rag.StageTimer(instrumentation.observe_stage)]
+                )
+                sources = [doc.metadata for doc in docs]
+            
+            parts = []
+            for text in tokens:
+                if first_token_s is None:
+                    first_token_s = time.perf_counter() - started
+                    instrumentation.observe_stage('time_to_first_token', first_token_s)
+                parts.append(text)
+                yield sse_event('token', {'text': text})
+            answer = ''.join(parts)
+            
+            if session_id:
+                with instrumentation.stage('history'):
+                    session_store.append(str(session_id), query, answer)
+            if cache_key and not cached:
+                answer_cache.put(*cache_key, answer, sources)
+            
+            yield sse_event('done', {
+                'response': answer,
+                'status': 'success',
+                'metadata': {
+                    'timestamp': datetime.now().isoformat(),
+                    'query_processed': query,
+                    'response_type': 'text',
+                    'sources': sources,
+                    'answer_cached': cached is not None,
+                    'tokens': token_counts(query, history),
+                    'time_to_first_token_ms': round((first_token_s or 0.0) * 1000, 1),
+                    'total_time_ms': round((time.perf_counter() - started) * 1000, 1)
+                }
+            })
+        except Exception as e:
+            logger.error(f"Error in chat stream: {str(e)}", exc_info=True)
+            yield sse_event('error', {
+                'error': str(e),
+                'error_type': type(e).__name__,
+                'status': 'error',
+                'timestamp': datetime.now().isoformat()
+            })
+        finally:
+            # Runs when the client disconnects too: stops generation and frees the LLM slot
+            if hasattr(tokens, 'close'):
+                tokens.close()
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        # Keep proxies from buffering the stream
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({
-        'status': 'healthy',
+    """Liveness plus readiness of each warm-up stage; answers while the stack is still loading"""
+    health = {
+        'status': {'ready': 'healthy', 'failed': 'unhealthy'}.get(startup['status'], 'starting'),
+        'ready': startup['status'] == 'ready',
+        'stages': startup['stages'],
         'timestamp': datetime.now().isoformat(),
         'cors': 'enabled'
-    })
+    }
+    if startup['error']:
+        health['error'] = startup['error']
+    if embedding_cache is not None:
+        health['embedding_cache'] = embedding_cache.stats()
+    if retriever is not None and hasattr(retriever, 'stats'):
+        health['query_cache'] = retriever.stats()
+    if answer_cache is not None:
+        health['answer_cache'] = answer_cache.stats()
+    if session_store is not None:
+        health['sessions'] = session_store.stats()
+    if rag is not None and startup['status'] == 'ready':
+        health['context'] = rag.context_stats.summary()
+        health['llm'] = llm.gate.stats()
+    return jsonify(health)
 
 @app.route('/test-cors', methods=['GET', 'POST', 'OPTIONS'])
 def test_cors():
@@ -130,15 +441,35 @@ def test_cors():
         'timestamp': datetime.now().isoformat()
     })
 
-# Initialize the application
-init_app()
+def is_reloader_watcher():
+    """
+    True in the parent process of `python server.py`'s debug reloader
+
+    The watcher only restarts the serving child (which sets WERKZEUG_RUN_MAIN)
+    and never handles requests, so it must not load models or sync the index
+    alongside the child.
+    """
+    return __name__ == "__main__" and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+
+# Initialize the application (in the serving process only)
+if __name__ == "__mp_main__":
+    # Ingestion's spawned PDF parser processes re-import this module
+    pass
+elif is_reloader_watcher():
+    logger.info("Reloader watcher process: the serving child loads the RAG stack")
+elif STARTUP_MODE == 'eager':
+    init_app()
+else:
+    start_background_init()
 
 if __name__ == "__main__":
     port = int(os.environ.get('PORT', 5000))
     logger.info(f"Starting Diabetes Assistant on port: {port}")
     logger.info("Available endpoints:")
     logger.info(" * /api/chat [POST]")
+    logger.info(" * /api/chat/stream [POST] (Server-Sent Events)")
     logger.info(" * /health [GET]")
+    logger.info(" * /metrics [GET] (Prometheus text format)")
     logger.info(" * /test-cors [GET, POST, OPTIONS]")
     
     app.run(debug=True, host='0.0.0.0', port=port)
\ No newline at end of file
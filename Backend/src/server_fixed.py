@@ -1,7 +1,6 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from main import initialize_llm, setup_qa_chain, create_vector_db
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from main import initialize_llm, setup_qa_chain, create_vector_db, get_embeddings
 from langchain_community.vectorstores import Chroma
 import os
 import logging
@@ -32,7 +31,7 @@ def init_app():
             vector_db = create_vector_db()
         else:
             logger.info("Loading existing vector database...")
-            embeddings = HuggingFaceEmbeddings(model_name='sentence-transformers/all-MiniLM-L6-v2')
+            embeddings = get_embeddings()
             vector_db = Chroma(persist_directory=db_path, embedding_function=embeddings)
         
         qa_chain = setup_qa_chain(vector_db, llm)
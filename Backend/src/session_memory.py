@@ -0,0 +1,192 @@
+"""
+Session Memory Stores
+Per-session chat history with a bounded window and eviction of idle sessions
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class InMemorySessionStore:
+    """
+    Thread-safe in-process store of (question, answer) turns per session
+
+    Each session keeps only its last max_turns turns, so prompts stop
+    growing after a few exchanges. At most max_sessions sessions are kept;
+    beyond that the least recently used is evicted, and sessions idle for
+    longer than idle_ttl seconds expire.
+    """
+
+    def __init__(self, max_turns=3, max_sessions=1000, idle_ttl=1800.0):
+        """
+        Args:
+            max_turns: Turns of history kept per session
+            max_sessions: Maximum number of sessions before the least recently used is evicted
+            idle_ttl: Seconds a session survives without a request (0 or less disables expiry)
+        """
+        if max_turns < 0:
+            raise ValueError("max_turns must be >= 0")
+        if max_sessions < 1:
+            raise ValueError("max_sessions must be >= 1")
+
+        self.max_turns = max_turns
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def history(self, session_id):
+        """The session's last turns as a list of (question, answer), oldest first"""
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return []
+            turns, last_used = session
+            if self.idle_ttl > 0 and now - last_used >= self.idle_ttl:
+                del self._sessions[session_id]
+                self.expirations += 1
+                return []
+            # Reading counts as use: refresh the idle timer and LRU position
+            self._sessions[session_id] = (turns, now)
+            self._sessions.move_to_end(session_id)
+            return list(turns)
+
+    def append(self, session_id, question, answer):
+        """Add a turn, dropping the oldest beyond max_turns"""
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            turns = session[0] if session else []
+            turns = (turns + [(question, answer)])[-self.max_turns:] if self.max_turns else []
+            self._sessions[session_id] = (turns, now)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self, session_id):
+        """Forget a session"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self):
+        """Session count and eviction counters"""
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'max_turns': self.max_turns,
+                'idle_ttl_seconds': self.idle_ttl,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+class SQLiteSessionStore:
+    """
+    Session store in a local SQLite file, shared by worker processes and kept across restarts
+
+    Same limits and interface as InMemorySessionStore.
+    """
+
+    def __init__(self, path, max_turns=3, max_sessions=1000, idle_ttl=1800.0):
+        """
+        Args:
+            path: SQLite database file
+            max_turns: Turns of history kept per session
+            max_sessions: Maximum number of sessions before the least recently used is evicted
+            idle_ttl: Seconds a session survives without a request (0 or less disables expiry)
+        """
+        if max_turns < 0:
+            raise ValueError("max_turns must be >= 0")
+        if max_sessions < 1:
+            raise ValueError("max_sessions must be >= 1")
+
+        self.path = path
+        self.max_turns = max_turns
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY, turns TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_used ON sessions (last_used)")
+        self._conn.commit()
+        self.evictions = 0
+        self.expirations = 0
+
+    def history(self, session_id):
+        """The session's last turns as a list of (question, answer), oldest first"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT turns, last_used FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return []
+            if self.idle_ttl > 0 and now - row[1] >= self.idle_ttl:
+                self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+                self._conn.commit()
+                self.expirations += 1
+                return []
+            # Reading counts as use: refresh the idle timer and LRU position
+            self._conn.execute("UPDATE sessions SET last_used = ? WHERE session_id = ?", (now, session_id))
+            self._conn.commit()
+            return [tuple(turn) for turn in json.loads(row[0])]
+
+    def append(self, session_id, question, answer):
+        """Add a turn, dropping the oldest beyond max_turns"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT turns FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            turns = json.loads(row[0]) if row else []
+            turns = (turns + [[question, answer]])[-self.max_turns:] if self.max_turns else []
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)", (session_id, json.dumps(turns), now)
+            )
+            if self.idle_ttl > 0:
+                self.expirations += self._conn.execute(
+                    "DELETE FROM sessions WHERE last_used < ?", (now - self.idle_ttl,)
+                ).rowcount
+            excess = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - self.max_sessions
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM sessions WHERE session_id IN"
+                    " (SELECT session_id FROM sessions ORDER BY last_used LIMIT ?)", (excess,)
+                )
+                self.evictions += excess
+            self._conn.commit()
+
+    def clear(self, session_id):
+        """Forget a session"""
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+    def stats(self):
+        """Session count and eviction counters"""
+        with self._lock:
+            sessions = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            return {
+                'backend': 'sqlite',
+                'path': self.path,
+                'sessions': sessions,
+                'max_sessions': self.max_sessions,
+                'max_turns': self.max_turns,
+                'idle_ttl_seconds': self.idle_ttl,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
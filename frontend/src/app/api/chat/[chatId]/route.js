@@ -135,6 +135,7 @@ async function sendMessage(request, context) {
       
       const requestData = {
         message: message.trim(),
+        session_id: chatId,
         conversation_history: recentMessages.map(msg => ({
           role: msg.role,
           content: msg.content
@@ -0,0 +1,39 @@
+/**
+ * Next.js API Route: POST /api/predictions/stream
+ * Streams NDJSON/CSV sample uploads to the Backend-Model Flask server and
+ * streams the NDJSON results back without buffering either side in memory
+ */
+
+const STREAM_CONTENT_TYPES = ['application/x-ndjson', 'application/jsonl', 'text/csv'];
+
+export async function POST(request) {
+  try {
+    const contentType = (request.headers.get('content-type') || '').split(';')[0].trim();
+    if (!STREAM_CONTENT_TYPES.includes(contentType)) {
+      return Response.json(
+        { error: `Content-Type must be one of: ${STREAM_CONTENT_TYPES.join(', ')}` },
+        { status: 415 }
+      );
+    }
+
+    const resp = await fetch('http://127.0.0.1:5001/api/predictions/stream', {
+      method: 'POST',
+      headers: { 'Content-Type': contentType },
+      body: request.body,
+      // Required by Node's fetch to send a ReadableStream body
+      duplex: 'half',
+    });
+
+    return new Response(resp.body, {
+      status: resp.status,
+      headers: { 'Content-Type': resp.headers.get('content-type') || 'application/x-ndjson' },
+    });
+  } catch (err) {
+    console.error('[api/predictions/stream] Error:', err);
+    return Response.json({ error: 'Internal error' }, { status: 500 });
+  }
+}
+
+export async function GET() {
+  return Response.json({ error: 'Method not allowed. Use POST.' }, { status: 405 });
+}
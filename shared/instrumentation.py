@@ -0,0 +1,246 @@
+"""
+Request Instrumentation
+Stage timers, Prometheus-style counters and histograms at /metrics, and sampled structured request logs for Flask
+"""
+
+import json
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds, from cached lookups to LLM calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Bucketed distribution (count, sum and cumulative buckets) per label combination"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        if list(buckets) != sorted(buckets):
+            raise ValueError("buckets must be sorted")
+
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # label values -> [per-bucket counts (last is +Inf), sum]
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the seconds spent in the block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, list(counts), total) for key, (counts, total) in self._series.items())
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _labels(self.labelnames, key, [("le", _number(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Current value read from a callable when metrics are rendered (None skips it)"""
+
+    def __init__(self, name, documentation, read):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+
+    def render(self):
+        try:
+            value = self.read()
+        except Exception:
+            value = None
+        if value is None:
+            return []
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge",
+                f"{self.name} {_number(value)}"]
+
+
+class Metrics:
+    """Registry of metrics sharing a name prefix"""
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self._metrics = []
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(f"{self.namespace}_{name}", documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(f"{self.namespace}_{name}", documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, read):
+        return self._register(Gauge(f"{self.namespace}_{name}", documentation, read))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text format"""
+        return "\n".join(line for metric in self._metrics for line in metric.render()) + "\n"
+
+
+class RequestInstrumentation:
+    """
+    Request metrics and logs for a Flask app
+
+    Every request is counted and timed by method, route and status. Code
+    wraps its phases in stage(), which feeds a per-stage histogram and the
+    request's log record. One JSON log line is written for a sample of
+    requests (sample_rate), and always for 5xx responses and for requests
+    slower than slow_request_s, so logging cost does not grow with traffic.
+    The metrics are served at metrics_path.
+
+    Streamed responses are timed until the response starts; stages that run
+    while the body streams still feed the stage histogram.
+    """
+
+    def __init__(self, app, namespace, logger, sample_rate=0.01, slow_request_s=1.0, metrics_path="/metrics"):
+        """
+        Args:
+            app: Flask app to instrument
+            namespace: Metric name prefix
+            logger: Logger for the structured request lines
+            sample_rate: Fraction of ordinary requests logged
+            slow_request_s: Requests at least this slow are always logged
+            metrics_path: Route serving the metrics
+        """
+        if not 0 <= sample_rate <= 1:
+            raise ValueError("sample_rate must be between 0 and 1")
+
+        self.logger = logger
+        self.sample_rate = sample_rate
+        self.slow_request_s = slow_request_s
+        self.metrics_path = metrics_path
+        self.metrics = Metrics(namespace)
+        self.requests = self.metrics.counter(
+            "http_requests_total", "HTTP requests by method, route and status", ("method", "route", "status")
+        )
+        self.latency = self.metrics.histogram(
+            "http_request_duration_seconds", "HTTP request latency until the response starts", ("method", "route")
+        )
+        self.stages = self.metrics.histogram(
+            "stage_duration_seconds", "Time spent in each request stage", ("stage",)
+        )
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule(metrics_path, "metrics", self._metrics_view, methods=["GET"])
+
+    @contextmanager
+    def stage(self, name):
+        """Time the block as request stage `name`"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(name, time.perf_counter() - started)
+
+    def observe_stage(self, name, seconds):
+        """Record a stage duration measured elsewhere (e.g. by a callback)"""
+        self.stages.observe(seconds, stage=name)
+        if has_request_context():
+            timings = g.get("stage_timings")
+            if timings is not None:
+                timings[name] = timings.get(name, 0.0) + seconds
+
+    def _start_request(self):
+        g.request_started = time.perf_counter()
+        g.stage_timings = {}
+
+    def _finish_request(self, response):
+        started = g.get("request_started")
+        if started is None or request.path == self.metrics_path:
+            return response
+        seconds = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        self.requests.inc(method=request.method, route=route, status=response.status_code)
+        self.latency.observe(seconds, method=request.method, route=route)
+
+        level = logging.WARNING if response.status_code >= 500 else logging.INFO
+        always = response.status_code >= 500 or seconds >= self.slow_request_s
+        if self.logger.isEnabledFor(level) and (always or random.random() < self.sample_rate):
+            self.logger.log(level, json.dumps({
+                "event": "request",
+                "method": request.method,
+                "route": route,
+                "status": response.status_code,
+                "duration_ms": round(seconds * 1000, 2),
+                "stages_ms": {name: round(value * 1000, 2) for name, value in g.stage_timings.items()},
+                "sampled": not always,
+            }))
+        return response
+
+    def _metrics_view(self):
+        return Response(self.metrics.render(), content_type=CONTENT_TYPE)